@@ -65,6 +65,96 @@ DEVICE = "auto"  # or "cuda", "cpu", "mps"
 DEFAULT_MAX_TOKENS = 512
 DEFAULT_TEMPERATURE = 0.7
 
+# Prices in USD per 1M tokens, used by the run cost ledger (harness/costs.py).
+# "cached_input" applies to prompt tokens the provider reports as served from its prompt cache.
+# Local models are free to call; unknown models are tracked for tokens but priced at 0.
+MODEL_PRICES = {
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-5": {"input": 1.25, "cached_input": 0.125, "output": 10.00},
+    "o1": {"input": 15.00, "cached_input": 7.50, "output": 60.00},
+    "gemini-2.5-flash": {"input": 0.30, "cached_input": 0.075, "output": 2.50},
+    "claude-sonnet-4-20250514": {"input": 3.00, "cached_input": 0.30, "output": 15.00},
+    "meta-llama/Llama-3.2-11B-Vision-Instruct": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+    "Qwen/Qwen3-VL-30B-A3B-Instruct": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+}
+
+# Process-wide HTTP connection pool shared by the API backends (inference/http_pool.py).
+# HTTP/2 needs the h2 package (pip install "httpx[http2]"); without it the pool falls back to HTTP/1.1.
+HTTP_POOL = {
+    "http2": True,
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 60.0,  # seconds an idle connection is kept open
+    "connect_timeout": 10.0,
+    "timeout": 600.0,  # read/write timeout; long generations can take minutes
+}
+
+# Processed-input cache for local models (tokenized prompts + image tensors)
+CACHE_DIR = PROJECT_ROOT / "cache"
+INPUT_CACHE_DIR = CACHE_DIR / "processed_inputs"
+USE_INPUT_CACHE = True
+
+# Vision-encoder outputs of local models, reused for every profile and group that sends the same image
+# (inference/vision_cache.py). Kept in host RAM; with a directory, entries evicted from RAM spill to disk.
+USE_VISION_CACHE = True
+VISION_CACHE_MAX_MEMORY_BYTES = 4 * 2**30
+VISION_CACHE_DIR = None  # e.g. CACHE_DIR / "vision_outputs"
+
+# Lifetime of Gemini explicit context caches (--gemini-context-cache); extended while in use
+GEMINI_CACHE_TTL_SECONDS = 3600
+
+# Manifest of provider file IDs for images uploaded once with --upload-images (inference/uploads.py)
+UPLOAD_MANIFEST = CACHE_DIR / "uploads.json"
+
+# CPU backend (--local-backend openvino): models are exported once to OpenVINO IR with weight-only
+# compression and compiled with CPU threading tuned for one generate call at a time
+OPENVINO = {
+    "weight_bits": 8,  # INT8 weights; 4 for INT4
+    "threads": None,  # None: every CPU this process may run on
+    "performance_hint": "LATENCY",
+    "export_dir": CACHE_DIR / "openvino",
+}
+# Local models optimum-intel can export through OVModelForVisualCausalLM (Qwen3-VL needs a release
+# with qwen3_vl export support). There is no OpenVINO export for the Mllama cross-attention
+# architecture, so Llama-3.2-Vision has no entry here.
+OPENVINO_MODELS = ["Qwen/Qwen3-VL-30B-A3B-Instruct"]
+
+# Low-memory CPU backend (--local-backend gguf): quantized GGUF weights plus the vision projector
+# (mmproj) run through llama.cpp. Files are glob patterns within a Hugging Face repo, or set
+# model_path/mmproj_path to local files. llama.cpp has no support for the Mllama cross-attention
+# architecture, so Llama-3.2-Vision has no entry here.
+GGUF_MODELS = {
+    "Qwen/Qwen3-VL-30B-A3B-Instruct": {
+        "repo_id": "Qwen/Qwen3-VL-30B-A3B-Instruct-GGUF",
+        "filename": "*Q4_K_M.gguf",
+        "mmproj": "mmproj*F16.gguf",
+        "chat_handler": "Qwen25VLChatHandler",  # class in llama_cpp.llama_chat_format
+    },
+}
+GGUF = {
+    "n_ctx": 8192,
+    "n_batch": 512,
+    "threads": None,  # None: every CPU this process may run on
+}
+
+# OpenAI-compatible serving endpoint for the local models (--local-backend endpoint), e.g. a
+# llama.cpp server, vLLM or SGLang. MODEL_ALIASES maps harness model names to the ids the server
+# serves them under; unmapped names are sent as-is.
+LOCAL_ENDPOINT = {
+    "base_url": os.getenv("LOCAL_ENDPOINT_URL", "http://localhost:8000/v1"),
+    "api_key": os.getenv("LOCAL_ENDPOINT_API_KEY", "EMPTY"),
+}
+MODEL_ALIASES = {}
+
+# Local model residency (inference/residency.py): how many models stay on the accelerator, how many
+# recently used ones are parked in host RAM, and an optional disk tier of memory-mappable safetensors copies
+MODEL_RESIDENCY = {
+    "max_device": 1,
+    "max_host": 0,  # host RAM holds a full bf16 copy per parked model
+    "disk_dir": None,  # e.g. str(CACHE_DIR / "warm_models") on fast local storage
+    "max_disk": 2,
+}
+
 # Output configuration
 SAVE_INTERMEDIATE_RESULTS = True
 RESULT_FILE_FORMAT = "json"
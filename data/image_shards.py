@@ -0,0 +1,176 @@
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+SHARD_SCHEME = "shard://"
+INDEX_FILENAME = "index.json"
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024
+
+
+def is_shard_ref(image_path: str) -> bool:
+    return image_path.startswith(SHARD_SCHEME)
+
+
+def shard_ref(key: str) -> str:
+    return f"{SHARD_SCHEME}{key}"
+
+
+def pack_images(images: Dict[str, str], out_dir: str, shard_size: int = DEFAULT_SHARD_SIZE) -> Dict:
+    # Concatenate images into shard files in the given order and write an offset index:
+    # {key: {"shard", "offset", "length", "suffix", "sha256"}}
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    entries = {}
+    shard_id = 0
+    shard_file = None
+    offset = 0
+    try:
+        for key, image_path in images.items():
+            with open(image_path, "rb") as f:
+                data = f.read()
+            if shard_file is None or (offset > 0 and offset + len(data) > shard_size):
+                if shard_file is not None:
+                    shard_file.close()
+                    shard_id += 1
+                shard_file = open(out_dir / f"shard-{shard_id:05d}.bin", "wb")
+                offset = 0
+            shard_file.write(data)
+            entries[key] = {
+                "shard": f"shard-{shard_id:05d}.bin",
+                "offset": offset,
+                "length": len(data),
+                "suffix": Path(image_path).suffix.lower(),
+                "sha256": hashlib.sha256(data).hexdigest(),
+            }
+            offset += len(data)
+    finally:
+        if shard_file is not None:
+            shard_file.close()
+
+    index = {"images": entries}
+    with open(out_dir / INDEX_FILENAME, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    return index
+
+
+def pack_question_bank(manifest_path: str, out_dir: str, out_manifest: str,
+                       image_root: Optional[str] = None, shard_size: int = DEFAULT_SHARD_SIZE) -> Dict:
+    # Pack a manifest's images (keyed by question id, in manifest order) and write a copy
+    # of the manifest whose image_path fields point at the shards
+    from data.question_bank import QuestionBank, write_manifest
+
+    bank = QuestionBank.open(manifest_path, image_root=image_root)
+    images = {}
+    questions_by_grade: Dict[int, Dict[str, dict]] = {}
+    for grade in bank.grades:
+        for question_id, question in bank.by_grade(grade).items():
+            images[question_id] = question["image_path"]
+            questions_by_grade.setdefault(grade, {})[question_id] = {
+                k: v for k, v in question.items() if k != "grade"
+            }
+
+    index = pack_images(images, out_dir, shard_size=shard_size)
+    for questions in questions_by_grade.values():
+        for question_id, question in questions.items():
+            question["image_path"] = shard_ref(question_id)
+    write_manifest(questions_by_grade, out_manifest)
+    return index
+
+
+class ImageShardReader:
+    # Reads images out of packed shards through read-only memory maps
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = Path(shard_dir)
+        with open(self.shard_dir / INDEX_FILENAME, 'r', encoding='utf-8') as f:
+            self._entries = json.load(f)["images"]
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def _map(self, shard: str) -> mmap.mmap:
+        if shard not in self._maps:
+            with open(self.shard_dir / shard, "rb") as f:
+                self._maps[shard] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[shard]
+
+    def _entry(self, key: str) -> Dict:
+        if key not in self._entries:
+            raise KeyError(f"Image not found in shards: {key}")
+        return self._entries[key]
+
+    def read_view(self, key: str) -> memoryview:
+        # Zero-copy view into the mapped shard
+        entry = self._entry(key)
+        return memoryview(self._map(entry["shard"]))[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def read(self, key: str) -> bytes:
+        return bytes(self.read_view(key))
+
+    def suffix(self, key: str) -> str:
+        return self._entry(key)["suffix"]
+
+    def sha256(self, key: str) -> str:
+        return self._entry(key)["sha256"]
+
+    def prefetch(self):
+        # Ask the kernel to read shards ahead sequentially (no-op where madvise is unavailable)
+        for shard in {entry["shard"] for entry in self._entries.values()}:
+            mapped = self._map(shard)
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+_reader: Optional[ImageShardReader] = None
+
+
+def register_image_shards(shard_dir: Optional[str]) -> Optional[ImageShardReader]:
+    # Make shard:// image references resolvable process-wide (None unregisters)
+    global _reader
+    if _reader is not None:
+        _reader.close()
+    _reader = ImageShardReader(shard_dir) if shard_dir else None
+    return _reader
+
+
+def get_shard_reader() -> ImageShardReader:
+    if _reader is None:
+        shard_dir = os.getenv("IMAGE_SHARD_DIR")
+        if not shard_dir:
+            raise RuntimeError("No image shards registered. Pass --image-shards or set IMAGE_SHARD_DIR.")
+        register_image_shards(shard_dir)
+    return _reader
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack question images into memory-mappable shards")
+    parser.add_argument("--out", type=str, required=True, help="Output shard directory")
+    parser.add_argument("--shard-size-mb", type=int, default=DEFAULT_SHARD_SIZE // (1024 * 1024))
+    parser.add_argument("--manifest", type=str, help="Pack the images of this JSONL question manifest")
+    parser.add_argument("--image-root", type=str, help="Directory relative image paths in --manifest resolve against")
+    parser.add_argument("--out-manifest", type=str, help="Where to write the shard-referencing manifest")
+    parser.add_argument("images", nargs="*", help="Image files to pack (keyed by file stem) when no --manifest is given")
+
+    args = parser.parse_args()
+    shard_size = args.shard_size_mb * 1024 * 1024
+
+    if args.manifest:
+        out_manifest = args.out_manifest or str(Path(args.out) / Path(args.manifest).name)
+        index = pack_question_bank(args.manifest, args.out, out_manifest,
+                                   image_root=args.image_root, shard_size=shard_size)
+        print(f"Wrote shard manifest: {out_manifest}")
+    else:
+        index = pack_images({Path(p).stem: p for p in args.images}, args.out, shard_size=shard_size)
+    print(f"Packed {len(index['images'])} images into {args.out}")
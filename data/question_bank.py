@@ -0,0 +1,212 @@
+import json
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+INDEX_VERSION = 1
+
+
+def index_path_for(manifest_path: Path) -> Path:
+    return manifest_path.with_name(manifest_path.name + ".index.json")
+
+
+def build_index(manifest_path: str) -> Dict:
+    # Single sequential scan of the JSONL manifest: byte offsets per ID plus grade/domain postings
+    manifest_path = Path(manifest_path)
+    offsets = {}
+    by_grade: Dict[str, List[str]] = {}
+    by_domain: Dict[str, List[str]] = {}
+
+    with open(manifest_path, "rb") as f:
+        offset = 0
+        for line in f:
+            length = len(line)
+            if line.strip():
+                record = json.loads(line)
+                question_id = record["question_number"]
+                if question_id in offsets:
+                    raise ValueError(f"Duplicate question id in manifest: {question_id}")
+                offsets[question_id] = [offset, length]
+                by_grade.setdefault(str(record.get("grade")), []).append(question_id)
+                if record.get("domain"):
+                    by_domain.setdefault(record["domain"], []).append(question_id)
+            offset += length
+
+    stat = manifest_path.stat()
+    index = {
+        "version": INDEX_VERSION,
+        "manifest_size": stat.st_size,
+        "manifest_mtime_ns": stat.st_mtime_ns,
+        "offsets": offsets,
+        "by_grade": by_grade,
+        "by_domain": by_domain,
+    }
+
+    index_path = index_path_for(manifest_path)
+    tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def load_index(manifest_path: str) -> Dict:
+    # Reuse the on-disk index unless the manifest changed since it was built
+    manifest_path = Path(manifest_path)
+    index_path = index_path_for(manifest_path)
+    if index_path.exists():
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        stat = manifest_path.stat()
+        if (index.get("version") == INDEX_VERSION
+                and index.get("manifest_size") == stat.st_size
+                and index.get("manifest_mtime_ns") == stat.st_mtime_ns):
+            return index
+    return build_index(manifest_path)
+
+
+def write_manifest(questions_by_grade: Dict[int, Dict[str, dict]], manifest_path: str) -> Dict:
+    # Export question dicts to a JSONL manifest and build its index
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        for grade, questions in questions_by_grade.items():
+            for question in questions.values():
+                record = {"grade": grade, **question}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return build_index(manifest_path)
+
+
+class QuestionView(Mapping):
+    # Read-only {question_id: question} mapping that parses records only when accessed
+
+    def __init__(self, bank: "QuestionBank", question_ids: List[str]):
+        self._bank = bank
+        self._ids = question_ids
+        self._id_set = None
+
+    def __getitem__(self, question_id: str) -> dict:
+        if self._id_set is None:
+            self._id_set = frozenset(self._ids)
+        if question_id not in self._id_set:
+            raise KeyError(question_id)
+        return self._bank.get(question_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class QuestionBank:
+    # Question set backed by a JSONL manifest (one question per line) with an index
+    # by ID, grade and domain; records are read lazily with a single seek
+
+    def __init__(self, index: Dict, manifest_path: Optional[Path] = None,
+                 records: Optional[Dict[str, dict]] = None, image_root: Optional[Path] = None,
+                 max_cached_records: int = 1024):
+        self._index = index
+        self._manifest_path = manifest_path
+        self._records = records
+        self._image_root = image_root
+        self._max_cached_records = max_cached_records
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+
+    @classmethod
+    def open(cls, manifest_path: str, image_root: Optional[str] = None) -> "QuestionBank":
+        # Relative image paths in the manifest resolve against image_root (default: manifest directory)
+        manifest_path = Path(manifest_path)
+        index = load_index(manifest_path)
+        root = Path(image_root) if image_root else manifest_path.parent
+        return cls(index, manifest_path=manifest_path, image_root=root)
+
+    @classmethod
+    def from_grades(cls, questions_by_grade: Dict[int, Dict[str, dict]]) -> "QuestionBank":
+        # In-memory bank over the built-in question dicts
+        records = {}
+        by_grade: Dict[str, List[str]] = {}
+        by_domain: Dict[str, List[str]] = {}
+        for grade, questions in questions_by_grade.items():
+            for question_id, question in questions.items():
+                records[question_id] = question
+                by_grade.setdefault(str(grade), []).append(question_id)
+                if question.get("domain"):
+                    by_domain.setdefault(question["domain"], []).append(question_id)
+        index = {"offsets": dict.fromkeys(records), "by_grade": by_grade, "by_domain": by_domain}
+        return cls(index, records=records)
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self._index["offsets"]
+
+    def __len__(self) -> int:
+        return len(self._index["offsets"])
+
+    @property
+    def grades(self) -> List[int]:
+        return sorted(int(g) for g in self._index["by_grade"] if g != "None")
+
+    @property
+    def domains(self) -> List[str]:
+        return sorted(self._index["by_domain"])
+
+    def get(self, question_id: str) -> dict:
+        if question_id not in self:
+            return {}
+        if self._records is not None:
+            return self._records[question_id]
+
+        if question_id in self._cache:
+            self._cache.move_to_end(question_id)
+            return self._cache[question_id]
+
+        offset, length = self._index["offsets"][question_id]
+        with open(self._manifest_path, "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.read(length))
+
+        image_path = record.get("image_path")
+        if image_path and "://" not in image_path and not Path(image_path).is_absolute():
+            record["image_path"] = str(self._image_root / image_path)
+
+        self._cache[question_id] = record
+        if len(self._cache) > self._max_cached_records:
+            self._cache.popitem(last=False)
+        return record
+
+    def ids_by_grade(self, grade: int) -> List[str]:
+        return self._index["by_grade"].get(str(grade), [])
+
+    def ids_by_domain(self, domain: str) -> List[str]:
+        return self._index["by_domain"].get(domain, [])
+
+    def by_grade(self, grade: int) -> QuestionView:
+        return QuestionView(self, self.ids_by_grade(grade))
+
+    def by_domain(self, domain: str) -> QuestionView:
+        return QuestionView(self, self.ids_by_domain(domain))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or export question bank manifests")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the built-in questions to a JSONL manifest")
+    export_parser.add_argument("manifest", type=str)
+
+    index_parser = subparsers.add_parser("index", help="(Re)build the index for a JSONL manifest")
+    index_parser.add_argument("manifest", type=str)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from data.question_data import GRADE4_QUESTIONS, GRADE8_QUESTIONS
+        index = write_manifest({4: GRADE4_QUESTIONS, 8: GRADE8_QUESTIONS}, args.manifest)
+    else:
+        index = build_index(args.manifest)
+    print(f"Indexed {len(index['offsets'])} questions "
+          f"({len(index['by_grade'])} grades, {len(index['by_domain'])} domains)")
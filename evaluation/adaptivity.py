@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from evaluation.scoring import list_results
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    # Append-only on-disk cache for one embedding model: raw float32 rows in vectors.f32
+    # plus a JSON index of text hash -> row, read back through a memory map
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.dir = Path(cache_dir) / model_name.replace('/', '_')
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.json"
+        self.rows: Dict[str, int] = {}
+        self.dim: Optional[int] = None
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.rows = index["rows"]
+            self.dim = index["dim"]
+
+    def lookup(self, hashes: List[str]) -> Tuple[np.ndarray, List[int]]:
+        # Returns (cached vectors with zero rows for misses, positions of misses)
+        missing = [i for i, h in enumerate(hashes) if h not in self.rows]
+        if self.dim is None or not self.rows:
+            return np.zeros((len(hashes), self.dim or 0), dtype=np.float32), missing
+        stored = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(max(self.rows.values()) + 1, self.dim))
+        found = np.zeros((len(hashes), self.dim), dtype=np.float32)
+        hit_positions = [i for i, h in enumerate(hashes) if h in self.rows]
+        if hit_positions:
+            found[hit_positions] = stored[[self.rows[hashes[i]] for i in hit_positions]]
+        return found, missing
+
+    def add(self, hashes: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        # Rows written by a run that died before rewriting the index are cut off first, so row
+        # numbers always match the file
+        committed = max(self.rows.values()) + 1 if self.rows else 0
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(committed * self.dim * vectors.itemsize)
+            f.write(vectors.tobytes())
+        for i, h in enumerate(hashes):
+            self.rows[h] = committed + i
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "rows": self.rows}, f)
+        os.replace(tmp_path, self.index_path)
+
+
+class Embedder:
+    # Local CPU sentence embedder with batched inference and the on-disk cache in front
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, cache_dir: Optional[str] = None,
+                 batch_size: int = 64, device: str = "cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.cache = EmbeddingCache(cache_dir, model_name) if cache_dir else None
+        self._model = None
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError("sentence-transformers package is required. Install with: pip install sentence-transformers")
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return np.asarray(self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                             normalize_embeddings=True), dtype=np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # Unit-normalized embeddings; only texts missing from the cache are encoded
+        hashes = [text_hash(t) for t in texts]
+        if self.cache is None:
+            return self._encode(texts)
+
+        vectors, missing = self.cache.lookup(hashes)
+        if missing:
+            # Identical texts (e.g. shared/deduplicated responses) are encoded once
+            unique = list(dict.fromkeys(hashes[i] for i in missing))
+            first_text = {}
+            for i in missing:
+                first_text.setdefault(hashes[i], texts[i])
+            encoded = self._encode([first_text[h] for h in unique])
+            self.cache.add(unique, encoded)
+            if vectors.shape[1] == 0:
+                vectors = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+            by_hash = dict(zip(unique, encoded))
+            for i in missing:
+                vectors[i] = by_hash[hashes[i]]
+        return vectors
+
+
+def load_results(results_dir: str) -> List[Dict]:
+    results = []
+    for path in list_results(results_dir):
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        if "response" in result:
+            results.append(result)
+    return results
+
+
+def similarity_matrix(embeddings: np.ndarray) -> np.ndarray:
+    # Cosine similarity of row vectors (rows are re-normalized defensively)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.maximum(norms, 1e-12)
+    return unit @ unit.T
+
+
+def adaptivity_score(similarity: np.ndarray) -> Optional[float]:
+    # 1 - mean off-diagonal similarity: 0 when every profile gets the same answer
+    n = similarity.shape[0]
+    if n < 2:
+        return None
+    off_diagonal = (similarity.sum() - np.trace(similarity)) / (n * (n - 1))
+    return float(1.0 - off_diagonal)
+
+
+def analyze_adaptivity(results: List[Dict], embedder: Embedder) -> Dict:
+    # Profile x profile similarity per (model, question, group) and mean adaptivity per (model, group)
+    texts = []
+    for result in results:
+        texts.extend(result.get("responses") or [result["response"] or ""])
+    vectors = embedder.embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+
+    # Average each profile's samples into one vector per cell member
+    cells: Dict[Tuple[str, str, int], Dict[str, List[np.ndarray]]] = {}
+    offset = 0
+    for result in results:
+        count = len(result.get("responses") or [result["response"]])
+        key = (result["model"], result["question_id"], result["group"])
+        cells.setdefault(key, {}).setdefault(result["learner_profile"], []).append(vectors[offset:offset + count])
+        offset += count
+
+    cell_rows = []
+    per_group: Dict[Tuple[str, int], List[float]] = {}
+    for (model, question_id, group), by_profile in sorted(cells.items()):
+        profiles = sorted(by_profile)
+        matrix = np.stack([np.concatenate(by_profile[p]).mean(axis=0) for p in profiles])
+        similarity = similarity_matrix(matrix)
+        score = adaptivity_score(similarity)
+        cell_rows.append({
+            "model": model,
+            "question_id": question_id,
+            "group": group,
+            "profiles": profiles,
+            "similarity": np.round(similarity, 4).tolist(),
+            "adaptivity": score,
+        })
+        if score is not None:
+            per_group.setdefault((model, group), []).append(score)
+
+    group_rows = [
+        {"model": model, "group": group, "cells": len(scores),
+         "mean_adaptivity": float(np.mean(scores)), "std_adaptivity": float(np.std(scores))}
+        for (model, group), scores in sorted(per_group.items())
+    ]
+    return {"embedding_model": embedder.model_name, "groups": group_rows, "cells": cell_rows}
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Measure how much responses differ across learner profiles")
+    parser.add_argument("--results", type=str, default="outputs", help="Results directory")
+    parser.add_argument("--embedding-model", type=str, default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--cache-dir", type=str, default=str(CACHE_DIR / "embeddings"))
+    args = parser.parse_args()
+
+    embedder = Embedder(args.embedding_model, cache_dir=args.cache_dir, batch_size=args.batch_size)
+    analysis = analyze_adaptivity(load_results(args.results), embedder)
+    output_path = Path(args.results) / "adaptivity.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(analysis, f, indent=2)
+    for row in analysis["groups"]:
+        print(f"{row['model']:<45} group {row['group']}: adaptivity {row['mean_adaptivity']:.3f} "
+              f"(±{row['std_adaptivity']:.3f}, {row['cells']} cells)")
+    print(f"Saved adaptivity analysis to: {output_path}")
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from inference.registry import LOCAL_BACKENDS, create_inference
+from evaluation.scoring import list_results
+
+# Bump RUBRIC_VERSION when the criteria change meaningfully; the rubric text is hashed too,
+# so any wording change already invalidates cached verdicts
+RUBRIC_VERSION = 1
+
+RUBRIC = """You are evaluating a mathematics tutoring response written for a specific learner.
+
+Learner profile:
+{learner}
+
+The math question is shown in the attached image. The tutor's response was:
+<response>
+{response}
+</response>
+
+Rate how well the response fits THIS learner on a 1-5 scale for each criterion:
+- grade_appropriateness: language, notation and methods match the learner's grade
+- prior_knowledge_fit: builds on topics the learner has mastered and their TIMSS level
+- affective_fit: tone suits the learner's attitude toward and confidence in mathematics
+- correctness: the mathematics is correct
+- overall: overall fit for this learner
+
+Reply with only a JSON object:
+{{"grade_appropriateness": n, "prior_knowledge_fit": n, "affective_fit": n, "correctness": n, "overall": n, "rationale": "one sentence"}}"""
+
+CRITERIA = ["grade_appropriateness", "prior_knowledge_fit", "affective_fit", "correctness", "overall"]
+JUDGE_CACHE_FILENAME = "judge_cache.jsonl"
+
+RUBRIC_HASH = hashlib.sha256(RUBRIC.encode('utf-8')).hexdigest()[:12]
+
+
+def judge_input_hash(result: Dict, judge_model: str) -> str:
+    # Everything the verdict depends on: response, learner, question, rubric and judge model
+    payload = {
+        "response": result.get("response", ""),
+        "learner_data": result.get("learner_data", {}),
+        "question_id": result.get("question_id"),
+        "image_path": result.get("question_data", {}).get("image_path"),
+        "rubric_version": RUBRIC_VERSION,
+        "rubric_hash": RUBRIC_HASH,
+        "judge_model": judge_model,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def describe_learner(learner_data: Dict) -> str:
+    attitude = "likes" if learner_data.get("likes_math") else "does not like"
+    return (
+        f"- Grade {learner_data.get('grade')}\n"
+        f"- {attitude} learning mathematics; {learner_data.get('confidence_level')}\n"
+        f"- Has mastered {learner_data.get('mastered_topics')}\n"
+        f"- TIMSS 2019 score: {learner_data.get('timss_score')}"
+    )
+
+
+def parse_verdict(text: str) -> Dict:
+    # Take the first JSON object in the reply; keep the raw text when nothing parses
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if match:
+        try:
+            verdict = json.loads(match.group(0))
+            scores = {c: verdict.get(c) for c in CRITERIA}
+            if all(isinstance(v, (int, float)) for v in scores.values()):
+                return {**scores, "rationale": verdict.get("rationale", ""), "parsed": True}
+        except json.JSONDecodeError:
+            pass
+    return {**{c: None for c in CRITERIA}, "rationale": "", "parsed": False, "raw": text}
+
+
+def mock_verdict(messages: List[Dict], seed: str) -> str:
+    # Deterministic pseudo-verdict for offline runs of the judge pipeline
+    digest = hashlib.sha256(seed.encode('utf-8')).digest()
+    verdict = {c: 1 + digest[i] % 5 for i, c in enumerate(CRITERIA)}
+    verdict["rationale"] = "mock verdict"
+    return json.dumps(verdict)
+
+
+class VerdictCache:
+    # Append-only JSONL cache of verdicts keyed by judge input hash; safe to share across threads
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._verdicts: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._verdicts[entry["input_hash"]] = entry["verdict"]
+
+    def get(self, input_hash: str) -> Optional[Dict]:
+        return self._verdicts.get(input_hash)
+
+    def put(self, input_hash: str, verdict: Dict):
+        with self._lock:
+            self._verdicts[input_hash] = verdict
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"input_hash": input_hash, "verdict": verdict}, ensure_ascii=False) + "\n")
+
+
+class Judge:
+    # LLM-as-judge over any backend from inference/registry.py
+
+    def __init__(self, judge_model: str, judge_type: str, cache: VerdictCache,
+                 max_new_tokens: int = 300, temperature: float = 0.0):
+        self.judge_model = judge_model
+        self.cache = cache
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        kwargs = {"responder": mock_verdict} if judge_type == "mock" else {}
+        self.backend = create_inference(judge_type, judge_model, **kwargs)
+        self.calls = 0
+
+    def judge(self, result: Dict) -> Dict:
+        input_hash = judge_input_hash(result, self.judge_model)
+        verdict = self.cache.get(input_hash)
+        cached = verdict is not None
+        if not cached:
+            prompt = RUBRIC.format(
+                learner=describe_learner(result.get("learner_data", {})),
+                response=result.get("response", ""),
+            )
+            image_path = result.get("question_data", {}).get("image_path")
+            output = self.backend.generate(
+                messages=[{"role": "user", "content": prompt}],
+                images=[image_path] if image_path else None,
+                max_new_tokens=self.max_new_tokens,
+                temperature=self.temperature,
+            )
+            self.calls += 1
+            verdict = parse_verdict(output["response"])
+            if verdict["parsed"]:
+                # Unparsed replies are not cached so a rerun retries them
+                self.cache.put(input_hash, verdict)
+        return {
+            "rubric_version": RUBRIC_VERSION,
+            "rubric_hash": RUBRIC_HASH,
+            "judge_model": self.judge_model,
+            "input_hash": input_hash,
+            "cached": cached,
+            "verdict": verdict,
+        }
+
+
+def _write_judgement(path: Path, judgement: Dict):
+    with open(path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    result["judge"] = judgement
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_judging(results_dir: str, judge_model: str, judge_type: str, workers: int = 8,
+                force: bool = False) -> Dict:
+    # Judge every result whose inputs changed since its last verdict, in parallel
+    results_dir = Path(results_dir)
+    cache = VerdictCache(results_dir / JUDGE_CACHE_FILENAME)
+    judge = Judge(judge_model, judge_type, cache)
+
+    pending = []
+    skipped = 0
+    for path in list_results(results_dir):
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        if "response" not in result:
+            continue
+        previous = result.get("judge", {})
+        if not force and previous.get("input_hash") == judge_input_hash(result, judge_model) \
+                and previous.get("verdict", {}).get("parsed"):
+            skipped += 1
+            continue
+        pending.append((path, result))
+
+    # In-process local models (HF, OpenVINO, llama.cpp) hold one model that is not safe to call
+    # concurrently; API judges and serving endpoints benefit from concurrent requests
+    if judge_type in LOCAL_BACKENDS and judge_type != "endpoint":
+        workers = 1
+
+    done = 0
+    errors = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(judge.judge, result): path for path, result in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _write_judgement(path, future.result())
+                done += 1
+            except Exception as e:
+                errors += 1
+                print(f"[ERROR] Judge failed for {path.name}: {e}")
+            print(f"✓ Judged {done + errors}/{len(pending)} results")
+
+    stats = {"judged": done, "errors": errors, "skipped_unchanged": skipped, "judge_calls": judge.calls}
+    print(f"Judge: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grade saved responses for learner-profile fit with an LLM judge")
+    parser.add_argument("--results", type=str, default="outputs", help="Results directory")
+    parser.add_argument("--judge-model", type=str, default="gpt-4o", help="Judge model name")
+    parser.add_argument("--judge-type", type=str, default="openai", help="Backend type (openai, gemini, llama, openvino, gguf, endpoint, mock)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent judge requests")
+    parser.add_argument("--force", action="store_true", help="Re-judge results even if their inputs are unchanged")
+    args = parser.parse_args()
+
+    run_judging(args.results, args.judge_model, args.judge_type, workers=args.workers, force=args.force)
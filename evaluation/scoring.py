@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import wordfreq
+except ImportError:
+    wordfreq = None
+
+# Bump when metric definitions change so existing scores are recomputed
+SCORER_VERSION = 3
+
+# Per-evaluation results are saved as {group}_{model}_{profile}_{question}[_s{n}].json
+# (AdaptiveLearningBenchmark.save_result); harness outputs in the same directory (summary.json,
+# plan.json, status.json, ...) never start with a group number
+RESULT_GLOB = "[1-4]_*.json"
+
+WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+SENTENCE_RE = re.compile(r"[.!?]+(?:\s|$)")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+# Numbered items ("1." / "2)"), "Step 3", or bullet lines
+STEP_RE = re.compile(r"^\s*(?:\d+[.)]\s|step\s*\d+|[-*•]\s)", re.IGNORECASE | re.MULTILINE)
+
+COUNT_FIELDS = ["words", "sentences", "syllables", "polysyllables", "letters", "long_words", "steps"]
+
+# Grade vocabulary: a word is within a grade's vocabulary when its Zipf frequency (log10 uses
+# per billion words, from wordfreq) reaches that grade's cutoff. Cutoffs fall linearly from
+# everyday words at grade 1 to general academic vocabulary at grade 12.
+VOCAB_GRADES = np.arange(1, 13)
+GRADE_ZIPF_CUTOFFS = np.linspace(4.5, 2.5, len(VOCAB_GRADES))
+# Share of words allowed above a grade's vocabulary before the response counts as above that grade
+VOCAB_TOLERANCE = 0.05
+
+
+def list_results(results_dir: str) -> List[Path]:
+    return sorted(Path(results_dir).glob(RESULT_GLOB))
+
+
+@lru_cache(maxsize=None)
+def zipf_frequency(word: str) -> Optional[float]:
+    if wordfreq is None:
+        return None
+    return wordfreq.zipf_frequency(word, "en")
+
+
+def count_syllables(word: str) -> int:
+    # Vowel-group heuristic with a silent trailing 'e'; good enough for readability formulas
+    word = word.lower()
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(count, 1)
+
+
+def text_counts(text: str) -> List[int]:
+    # Raw counts in COUNT_FIELDS order, then the number of words above each VOCAB_GRADES
+    # vocabulary (-1 without wordfreq); the formulas are applied to whole arrays later
+    words = WORD_RE.findall(text or "")
+    syllables = [count_syllables(w) for w in words]
+    counts = [
+        len(words),
+        max(len(SENTENCE_RE.findall(text or "")), 1 if words else 0),
+        sum(syllables),
+        sum(1 for s in syllables if s >= 3),
+        sum(len(w) for w in words),
+        sum(1 for w in words if len(w) >= 7),
+        len(STEP_RE.findall(text or "")),
+    ]
+    if wordfreq is None:
+        return counts + [-1] * len(VOCAB_GRADES)
+    frequencies = np.array([zipf_frequency(w.lower()) for w in words], dtype=float)
+    above = (frequencies[:, None] < GRADE_ZIPF_CUTOFFS[None, :]).sum(axis=0)
+    return counts + [int(n) for n in above]
+
+
+def readability_scores(counts: np.ndarray, grades: np.ndarray) -> Dict[str, np.ndarray]:
+    # Vectorized readability/grade-level formulas over an (n, len(COUNT_FIELDS)) count matrix
+    words, sentences, syllables, polysyllables, letters, long_words, steps = counts[:, :len(COUNT_FIELDS)].T.astype(float)
+    safe_words = np.maximum(words, 1)
+    safe_sentences = np.maximum(sentences, 1)
+    words_per_sentence = words / safe_sentences
+    syllables_per_word = syllables / safe_words
+
+    flesch_reading_ease = 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+    flesch_kincaid_grade = 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59
+    smog_grade = 1.0430 * np.sqrt(polysyllables * (30 / safe_sentences)) + 3.1291
+    coleman_liau = 0.0588 * (letters / safe_words * 100) - 0.296 * (sentences / safe_words * 100) - 15.8
+
+    # Vocabulary against grade: share of words above the learner's grade vocabulary, and the
+    # lowest grade whose vocabulary covers the response (13: beyond grade 12)
+    above = counts[:, len(COUNT_FIELDS):].astype(float)
+    above[above < 0] = np.nan
+    above_share = above / safe_words[:, None]
+    grade_column = np.clip(np.nan_to_num(grades, nan=1), VOCAB_GRADES[0], VOCAB_GRADES[-1]).astype(int) - VOCAB_GRADES[0]
+    above_grade_vocab_ratio = np.where(np.isnan(grades), np.nan, above_share[np.arange(len(counts)), grade_column])
+    covered = above_share <= VOCAB_TOLERANCE
+    vocabulary_grade = np.where(covered.any(axis=1), VOCAB_GRADES[covered.argmax(axis=1)], VOCAB_GRADES[-1] + 1).astype(float)
+    vocabulary_grade[np.isnan(above).any(axis=1)] = np.nan
+
+    empty = words == 0
+    scores = {
+        "word_count": words,
+        "sentence_count": sentences,
+        "step_count": steps,
+        "avg_words_per_sentence": words_per_sentence,
+        "avg_syllables_per_word": syllables_per_word,
+        "complex_word_ratio": polysyllables / safe_words,
+        "long_word_ratio": long_words / safe_words,
+        "flesch_reading_ease": flesch_reading_ease,
+        "flesch_kincaid_grade": flesch_kincaid_grade,
+        "smog_grade": smog_grade,
+        "coleman_liau_index": coleman_liau,
+        # Positive: the explanation reads above the learner's grade
+        "grade_gap": flesch_kincaid_grade - grades,
+        "above_grade_vocab_ratio": above_grade_vocab_ratio,
+        "vocabulary_grade": vocabulary_grade,
+        # Positive: the explanation's vocabulary is above the learner's grade
+        "vocabulary_grade_gap": vocabulary_grade - grades,
+    }
+    for name in scores:
+        if name not in ("word_count", "sentence_count", "step_count"):
+            scores[name] = np.where(empty, np.nan, scores[name])
+    return scores
+
+
+def _rows(scores: Dict[str, np.ndarray], count: int) -> List[Dict]:
+    rows = []
+    for i in range(count):
+        row = {}
+        for name, values in scores.items():
+            value = float(values[i])
+            row[name] = None if np.isnan(value) else round(value, 4)
+        rows.append(row)
+    return rows
+
+
+def _summary_entry(result: Dict) -> Dict:
+    return {"model": result["model"], "group": result["group"], "learner_profile": result["learner_profile"],
+            "response": result.get("scores", {}).get("response")}
+
+
+def score_files(paths: List[str], force: bool = False) -> Tuple[int, List[Dict]]:
+    # Worker: load each result once, score it if it has no current scores, write it back, and
+    # return (number scored, summary entries for every result in the chunk)
+    results: List[Tuple[str, Dict]] = []
+    pending: List[int] = []
+    texts: List[str] = []
+    grades: List[float] = []
+    owners: List[int] = []  # result position of each text
+
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if "response" not in result:
+            continue
+        results.append((path, result))
+        if not force and result.get("scores", {}).get("version") == SCORER_VERSION:
+            continue
+        result_index = len(results) - 1
+        pending.append(result_index)
+        grade = float(result.get("learner_data", {}).get("grade") or np.nan)
+        # "response" is responses[0] when several samples were drawn, so score each sample once
+        for text in result.get("responses") or [result.get("response")]:
+            texts.append(text or "")
+            grades.append(grade)
+            owners.append(result_index)
+
+    if texts:
+        width = len(COUNT_FIELDS) + len(VOCAB_GRADES)
+        counts = np.array([text_counts(t) for t in texts], dtype=np.int64).reshape(len(texts), width)
+        rows = _rows(readability_scores(counts, np.array(grades)), len(texts))
+        scored: Dict[int, Dict] = {}
+        for result_index, row in zip(owners, rows):
+            entry = scored.setdefault(result_index, {"version": SCORER_VERSION, "response": row, "samples": []})
+            entry["samples"].append(row)
+        for result_index in pending:
+            path, result = results[result_index]
+            result["scores"] = scored[result_index]
+            write_result(path, result)
+
+    return len(pending), [_summary_entry(result) for _, result in results]
+
+
+def write_result(path: str, result: Dict):
+    # Atomic in-place update so an interrupted run never leaves a truncated result file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def summarize_scores(results_dir: str, entries: Optional[List[Dict]] = None) -> Dict:
+    # Mean of each score per (model, group, learner_profile); entries (from score_files) saves
+    # reading every result again
+    if entries is None:
+        entries = []
+        for path in list_results(results_dir):
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            if "response" in result:
+                entries.append(_summary_entry(result))
+
+    groups: Dict[Tuple[str, int, str], List[Dict]] = {}
+    for entry in entries:
+        if not entry["response"]:
+            continue
+        key = (entry["model"], entry["group"], entry["learner_profile"])
+        groups.setdefault(key, []).append(entry["response"])
+
+    rows = []
+    for (model, group, profile), scores in sorted(groups.items()):
+        names = scores[0].keys()
+        matrix = np.array([[e.get(n) if e.get(n) is not None else np.nan for n in names] for e in scores], dtype=float)
+        with warnings.catch_warnings():
+            # All-empty columns (e.g. vocabulary scores without wordfreq) average to NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means = np.nanmean(matrix, axis=0)
+        rows.append({
+            "model": model,
+            "group": group,
+            "learner_profile": profile,
+            "n": len(scores),
+            **{n: (None if np.isnan(m) else round(float(m), 4)) for n, m in zip(names, means)},
+        })
+
+    summary = {"scorer_version": SCORER_VERSION, "rows": rows}
+    with open(Path(results_dir) / "scores_summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def run_scoring(results_dir: str, workers: Optional[int] = None, chunk_size: int = 256,
+                force: bool = False) -> int:
+    # Score all pending results in a process pool; each worker writes its chunk back as it goes
+    if wordfreq is None:
+        print("[WARN] wordfreq is not installed; vocabulary-level scores are left empty (pip install wordfreq)")
+    paths = [str(path) for path in list_results(results_dir)]
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    done = 0
+    checked = 0
+    entries: List[Dict] = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(score_files, chunk, force) for chunk in chunks]
+        for future in as_completed(futures):
+            scored, chunk_entries = future.result()
+            done += scored
+            checked += len(chunk_entries)
+            entries.extend(chunk_entries)
+            print(f"✓ Checked {checked}/{len(paths)} results, scored {done}")
+
+    summarize_scores(results_dir, entries)
+    return done
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score generated tutoring responses (readability, length, steps)")
+    parser.add_argument("--results", type=str, default="outputs", help="Results directory")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Result files per worker task")
+    parser.add_argument("--force", action="store_true", help="Rescore results that already have current scores")
+    args = parser.parse_args()
+
+    scored = run_scoring(args.results, workers=args.workers, chunk_size=args.chunk_size, force=args.force)
+    print(f"Scored {scored} results. Summary: {Path(args.results) / 'scores_summary.json'}")
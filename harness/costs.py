@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Optional
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _empty_totals() -> Dict:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+class CostLedger:
+    # Running token/cost totals per model, group and profile, with optional budget limits
+    # checked before each request is sent
+
+    def __init__(self, prices: Dict[str, Dict[str, float]], max_cost: Optional[float] = None,
+                 max_tokens: Optional[int] = None):
+        self.prices = prices
+        self.max_cost = max_cost
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self.total = _empty_totals()
+        self.by_model: Dict[str, Dict] = {}
+        self.by_group: Dict[str, Dict] = {}
+        self.by_profile: Dict[str, Dict] = {}
+        self.cancelled = 0
+        # Per-call estimates (cost_usd, tokens) used until a model's first call has completed
+        self.priors: Dict[str, Dict] = {}
+
+    def seed(self, model_name: str, cost_usd: float, tokens: float):
+        self.priors[model_name] = {"cost_usd": cost_usd, "tokens": tokens}
+
+    def price(self, model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        prices = self.prices.get(model_name, {})
+        uncached = max(prompt_tokens - cached_tokens, 0)
+        return (
+            uncached * prices.get("input", 0.0)
+            + cached_tokens * prices.get("cached_input", prices.get("input", 0.0))
+            + completion_tokens * prices.get("output", 0.0)
+        ) / 1_000_000
+
+    def record(self, model_name: str, group: int, profile: str, usage: Dict) -> float:
+        # usage is a backend result/metadata dict; local backends only report tokens_generated
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            completion_tokens = usage.get("tokens_generated") or 0
+        cached_tokens = usage.get("cached_tokens") or 0
+        cost = self.price(model_name, prompt_tokens, completion_tokens, cached_tokens)
+
+        with self._lock:
+            for bucket in (self.total,
+                           self.by_model.setdefault(model_name, _empty_totals()),
+                           self.by_group.setdefault(str(group), _empty_totals()),
+                           self.by_profile.setdefault(profile, _empty_totals())):
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += prompt_tokens
+                bucket["cached_tokens"] += cached_tokens
+                bucket["completion_tokens"] += completion_tokens
+                bucket["cost_usd"] += cost
+        return cost
+
+    def expected_call_cost(self, model_name: str) -> float:
+        # Mean cost of this model's calls so far (the seeded estimate, or 0, until one has completed)
+        model = self.by_model.get(model_name)
+        if not model or not model["calls"]:
+            return self.priors.get(model_name, {}).get("cost_usd", 0.0)
+        return model["cost_usd"] / model["calls"]
+
+    def expected_call_tokens(self, model_name: str) -> float:
+        model = self.by_model.get(model_name)
+        if not model or not model["calls"]:
+            return self.priors.get(model_name, {}).get("tokens", 0.0)
+        return (model["prompt_tokens"] + model["completion_tokens"]) / model["calls"]
+
+    def check(self, model_name: str):
+        # Raise before sending a request that would (on average) push the run over budget
+        with self._lock:
+            spent = self.total["cost_usd"]
+            tokens = self.total["prompt_tokens"] + self.total["completion_tokens"]
+            if self.max_cost is not None and spent + self.expected_call_cost(model_name) > self.max_cost:
+                raise BudgetExceeded(f"cost budget ${self.max_cost:.2f} reached (spent ${spent:.4f})")
+            if self.max_tokens is not None and tokens + self.expected_call_tokens(model_name) > self.max_tokens:
+                raise BudgetExceeded(f"token budget {self.max_tokens} reached (used {tokens})")
+
+    def summary(self) -> Dict:
+        def rounded(bucket: Dict) -> Dict:
+            return {**bucket, "cost_usd": round(bucket["cost_usd"], 6)}
+
+        with self._lock:
+            return {
+                "total": rounded(self.total),
+                "by_model": {k: rounded(v) for k, v in self.by_model.items()},
+                "by_group": {k: rounded(v) for k, v in self.by_group.items()},
+                "by_profile": {k: rounded(v) for k, v in self.by_profile.items()},
+                "max_cost_usd": self.max_cost,
+                "max_tokens": self.max_tokens,
+                "cancelled_jobs": self.cancelled,
+            }
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from inference.base_inference import image_digest, load_image
+
+
+def canonical_request_key(model_name: str, messages: List[Dict], images: List[str],
+                          params: Optional[Dict] = None) -> str:
+    # Everything the backend actually sees: model, message text, image content, generation params.
+    # Learner profile / group labels are deliberately excluded so identical requests collide.
+    payload = {
+        "model": model_name,
+        "messages": [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages],
+        "images": [image_digest(load_image(img)) for img in images],
+        "params": params or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class _Call:
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    # Singleflight over canonical request keys: concurrent callers with the same key wait for
+    # the first one, and (with remember=True) later callers reuse its finished result
+
+    def __init__(self, remember: bool = True):
+        self.remember = remember
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any], owner: str = "") -> Tuple[Any, Optional[str]]:
+        # Returns (result, shared_from): shared_from is the owner label of the call that
+        # produced the result, or None if this caller executed it
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(owner)
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            with self._lock:
+                self.shared += 1
+            return call.result, call.owner
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            # Failed calls are never remembered, so a later caller can retry
+            with self._lock:
+                self._calls.pop(key, None)
+            raise
+        finally:
+            call.done.set()
+
+        with self._lock:
+            self.executed += 1
+            if not self.remember:
+                self._calls.pop(key, None)
+        return call.result, None
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "shared": self.shared}
@@ -0,0 +1,248 @@
+import json
+import math
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import MODEL_PRICES, DEFAULT_MAX_TOKENS, HUGGINGFACE_TOKEN
+from harness.costs import CostLedger
+from prompts.catalog import CATALOG, encode_text, tokenizer_id
+from data.question_data import get_question
+from evaluation.scoring import list_results
+from inference.registry import LOCAL_BACKENDS
+
+# Fallback when no tokenizer is available for a model (e.g. Gemini, which only counts server-side)
+CHARS_PER_TOKEN = 4
+# Chat-format tokens per message (role markers, separators) on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+# Assumed size for images whose dimensions cannot be read locally (e.g. http URLs)
+DEFAULT_IMAGE_SIZE = (1024, 1024)
+
+
+def load_tokenizer(model_name: str, model_type: str):
+    # tiktoken for OpenAI models, the HF tokenizer for local models; None falls back to CHARS_PER_TOKEN
+    if model_type == "openai":
+        try:
+            import tiktoken
+        except ImportError:
+            print(f"[WARN] tiktoken is not installed; counting {model_name} prompts at ~{CHARS_PER_TOKEN} chars/token")
+            return None
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    if model_type in LOCAL_BACKENDS:
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            print(f"[WARN] transformers is not installed; counting {model_name} prompts at ~{CHARS_PER_TOKEN} chars/token")
+            return None
+        token_kwargs = {"token": HUGGINGFACE_TOKEN} if HUGGINGFACE_TOKEN else {}
+        try:
+            return AutoTokenizer.from_pretrained(model_name, **token_kwargs)
+        except (OSError, ValueError) as e:
+            # Gated without access, or not downloaded on an offline node
+            print(f"[WARN] No tokenizer for {model_name} ({e.__class__.__name__}); "
+                  f"counting its prompts at ~{CHARS_PER_TOKEN} chars/token")
+            return None
+    return None
+
+
+class TokenCounter:
+    # Token counts for one model's tokenizer, memoized by text (prompts repeat across the grid).
+    # Catalog prompts are counted from CATALOG.tokenized, so only other texts are encoded here.
+
+    def __init__(self, model_name: str, model_type: str):
+        self.tokenizer = load_tokenizer(model_name, model_type)
+        self.name = tokenizer_id(self.tokenizer) if self.tokenizer is not None else f"~{CHARS_PER_TOKEN} chars/token"
+        self._counts: Dict[str, int] = {}
+        if self.tokenizer is not None:
+            for cell, token_ids in CATALOG.tokenized(self.tokenizer).items():
+                for text, ids in zip(CATALOG.prompts(*cell), token_ids):
+                    self._counts[text] = len(ids)
+
+    def count(self, text: str) -> int:
+        if text not in self._counts:
+            if self.tokenizer is None:
+                self._counts[text] = math.ceil(len(text) / CHARS_PER_TOKEN)
+            else:
+                self._counts[text] = len(encode_text(self.tokenizer, text))
+        return self._counts[text]
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        return sum(self.count(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def openai_image_tokens(width: int, height: int) -> int:
+    # High detail: fit within 2048x2048, scale the short side to 768, then 170 per 512px tile + 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def gemini_image_tokens(width: int, height: int) -> int:
+    # 258 tokens when both sides are <= 384px, otherwise 258 per 768x768 tile
+    if width <= 384 and height <= 384:
+        return 258
+    return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+
+def mllama_image_tokens(width: int, height: int) -> int:
+    # Llama 3.2 Vision: up to 4 tiles of 560x560, 1601 vision tokens each (cross-attended, not in the prompt)
+    tiles = min(4, math.ceil(width / 560) * math.ceil(height / 560))
+    return tiles * 1601
+
+
+def qwen_vl_image_tokens(width: int, height: int, pixels_per_token: int = 32) -> int:
+    # Qwen-VL: one token per merged 2x2 patch group (32px for Qwen3-VL, 28px for Qwen2.5-VL),
+    # capped by the processor's default max_pixels
+    tokens = max(1, round(width / pixels_per_token)) * max(1, round(height / pixels_per_token))
+    return min(tokens, 16384)
+
+
+def image_token_estimator(model_name: str, model_type: str) -> Callable[[int, int], int]:
+    if model_type == "openai":
+        return openai_image_tokens
+    if model_type == "gemini":
+        return gemini_image_tokens
+    if "qwen" in model_name.lower():
+        if "2.5" in model_name:
+            return lambda w, h: qwen_vl_image_tokens(w, h, pixels_per_token=28)
+        return qwen_vl_image_tokens
+    return mllama_image_tokens
+
+
+@lru_cache(maxsize=4096)
+def image_size(image_path: str) -> Tuple[int, int]:
+    # PIL only reads the header here, so this is cheap even for large images
+    from inference.base_inference import load_image, open_image
+    path = load_image(image_path)
+    if path.startswith(("http://", "https://")):
+        return DEFAULT_IMAGE_SIZE
+    try:
+        with open_image(path) as image:
+            return image.size
+    except (OSError, ImportError):
+        return DEFAULT_IMAGE_SIZE
+
+
+def load_history(results_dir: str) -> Dict[str, Dict]:
+    # Per-model measurements from earlier results: mean latency and completion tokens per response
+    totals: Dict[str, Dict] = {}
+    for path in list_results(results_dir):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        metadata = result.get("metadata", {})
+        latency = metadata.get("latency_seconds")
+        # Shared results reuse another cell's call and say nothing about throughput
+        if latency is None or metadata.get("shared"):
+            continue
+        completion_tokens = metadata.get("completion_tokens", metadata.get("tokens_generated")) or 0
+        entry = totals.setdefault(result["model"], {"calls": 0, "responses": 0, "latency_seconds": 0.0,
+                                                    "completion_tokens": 0})
+        entry["calls"] += 1
+        entry["responses"] += len(result.get("responses") or [result.get("response")])
+        entry["latency_seconds"] += latency
+        entry["completion_tokens"] += completion_tokens
+
+    history = {}
+    for model, entry in totals.items():
+        history[model] = {
+            "calls": entry["calls"],
+            "mean_latency_seconds": entry["latency_seconds"] / entry["calls"],
+            "mean_completion_tokens": entry["completion_tokens"] / entry["responses"],
+            "completion_tokens_per_second": (entry["completion_tokens"] / entry["latency_seconds"]
+                                             if entry["latency_seconds"] else None),
+        }
+    return history
+
+
+def estimate_plan(jobs: Iterable[Dict], build_messages: Callable[..., List[Dict]],
+                  history: Optional[Dict[str, Dict]] = None, samples: int = 1,
+                  max_new_tokens: int = DEFAULT_MAX_TOKENS) -> Dict:
+    # Expand the job grid and project tokens, cost and sequential wall time per model.
+    # Completion tokens come from history when available, otherwise max_new_tokens (an upper bound).
+    history = history or {}
+    ledger = CostLedger(MODEL_PRICES)
+    counters: Dict[str, TokenCounter] = {}
+    rows: Dict[str, Dict] = {}
+
+    for job in jobs:
+        model_name = job["model_name"]
+        if model_name not in rows:
+            counters[model_name] = TokenCounter(model_name, job["model_type"])
+            rows[model_name] = {
+                "model": model_name,
+                "model_type": job["model_type"],
+                "tokenizer": counters[model_name].name,
+                "calls": 0,
+                "prompt_tokens": 0,
+                "image_tokens": 0,
+                "_image_tokens": image_token_estimator(model_name, job["model_type"]),
+            }
+        row = rows[model_name]
+
+        system_prompt, user_prompt = CATALOG.prompts(job["learner_profile"], job["group"])
+        image_paths = [get_question(job["question_id"])["image_path"]]
+        messages = build_messages(system_prompt, user_prompt, image_paths, group=job["group"])
+        row["calls"] += 1
+        row["prompt_tokens"] += counters[model_name].count_messages(messages)
+        row["image_tokens"] += sum(row["_image_tokens"](*image_size(p)) for p in image_paths)
+
+    models = []
+    for model_name, row in rows.items():
+        del row["_image_tokens"]
+        measured = history.get(model_name)
+        responses = row["calls"] * samples
+        if measured:
+            row["completion_tokens"] = round(measured["mean_completion_tokens"] * responses)
+            row["completion_source"] = f"history ({measured['calls']} calls)"
+        else:
+            row["completion_tokens"] = max_new_tokens * responses
+            row["completion_source"] = "max_new_tokens"
+        input_tokens = row["prompt_tokens"] + row["image_tokens"]
+        row["cost_usd"] = round(ledger.price(model_name, input_tokens, row["completion_tokens"]), 4)
+        throughput = measured and measured["completion_tokens_per_second"]
+        row["wall_seconds"] = round(row["completion_tokens"] / throughput) if throughput else None
+        models.append(row)
+
+    known_walls = [m["wall_seconds"] for m in models if m["wall_seconds"] is not None]
+    return {
+        "samples": samples,
+        "models": models,
+        "total": {
+            "calls": sum(m["calls"] for m in models),
+            "prompt_tokens": sum(m["prompt_tokens"] for m in models),
+            "image_tokens": sum(m["image_tokens"] for m in models),
+            "completion_tokens": sum(m["completion_tokens"] for m in models),
+            "cost_usd": round(sum(m["cost_usd"] for m in models), 4),
+            "wall_seconds": sum(known_walls) if known_walls else None,
+            "models_without_throughput": [m["model"] for m in models if m["wall_seconds"] is None],
+        },
+    }
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m" if hours else f"{rest // 60}m{rest % 60:02d}s"
+
+
+def print_plan(plan: Dict):
+    print(f"\n{'='*60}")
+    print("RUN PLAN (dry run, nothing is sent)")
+    print(f"{'='*60}")
+    for row in plan["models"]:
+        print(f"\n{row['model']} [{row['tokenizer']}]")
+        print(f"  calls: {row['calls']}  prompt tokens: {row['prompt_tokens']:,}  image tokens: {row['image_tokens']:,}")
+        print(f"  completion tokens: {row['completion_tokens']:,} ({row['completion_source']})")
+        print(f"  cost: ${row['cost_usd']:.2f}  wall time: {format_duration(row['wall_seconds'])}")
+    total = plan["total"]
+    print(f"\nTotal: {total['calls']} calls, ${total['cost_usd']:.2f}, wall time {format_duration(total['wall_seconds'])}")
+    if total["models_without_throughput"]:
+        print(f"No measured throughput yet for: {', '.join(total['models_without_throughput'])}")
@@ -0,0 +1,199 @@
+import concurrent.futures
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from harness.costs import BudgetExceeded
+
+# Calls of a model observed before its latency quantile is trusted for hedging
+MIN_LATENCY_SAMPLES = 20
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class LatencyTracker:
+    # Latencies of recent successful requests per model (hedged duplicates included, each timed
+    # from its own send), so hedging does not pull its own trigger point down
+
+    def __init__(self, window: int = 200, min_samples: int = MIN_LATENCY_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, model_name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, model_name: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model_name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+
+class RequestHedger:
+    # Per-call deadlines and optional hedging for requests to API backends. The request runs on
+    # a worker thread; once it has been in flight longer than the model's observed latency
+    # quantile (p95 by default), an identical request is sent and whichever finishes first is
+    # used. A hedge is only sent if the budget check passes. Requests still running when the
+    # caller moves on (the losing hedge, or calls past their deadline) are abandoned: their
+    # results are discarded, but reported through on_discarded so their tokens are still billed.
+    # Python cannot interrupt a running call, so the deadline is also passed to the backend as
+    # its request timeout, which ends abandoned calls on the provider side.
+
+    def __init__(self, deadline_seconds: Optional[float] = None, hedge: bool = False, quantile: float = 0.95,
+                 retries: int = 1, budget_check: Optional[Callable[[str], None]] = None, max_workers: int = 16,
+                 log: Callable[[str], None] = print):
+        self.deadline_seconds = deadline_seconds
+        self.hedge = hedge
+        self.quantile = quantile
+        self.retries = retries
+        self.budget_check = budget_check
+        self.log = log
+        self.latencies = LatencyTracker()
+        self._pool = None
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.deadline_exceeded = 0
+        self.retried = 0
+        self.discarded_cost = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.hedge or self.deadline_seconds is not None
+
+    def _submit(self, model_name: str, send: Callable[[Optional[float]], Dict], timeout: Optional[float]):
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers,
+                                                               thread_name_prefix="request")
+        sent_at = time.monotonic()
+
+        def timed():
+            result = send(timeout)
+            self.latencies.record(model_name, time.monotonic() - sent_at)
+            return result
+
+        return self._pool.submit(timed)
+
+    def run(self, model_name: str, send: Callable[[Optional[float]], Dict], hedgeable: bool = True,
+            on_discarded: Optional[Callable[[Dict], float]] = None,
+            on_retry: Optional[Callable[[], None]] = None) -> Dict:
+        # send(timeout) performs one request; timeout is the time left before the deadline (or None)
+        with self._lock:
+            self.calls += 1
+        if not hedgeable or not self.active:
+            # Local backends run inline and enforce the deadline themselves (e.g. max_time)
+            start = time.monotonic()
+            result = send(self.deadline_seconds)
+            self.latencies.record(model_name, time.monotonic() - start)
+            return result
+
+        for attempt in range(self.retries + 1):
+            try:
+                return self._run_once(model_name, send, on_discarded)
+            except DeadlineExceeded:
+                if attempt == self.retries:
+                    raise
+                if self.budget_check is not None:
+                    self.budget_check(model_name)
+                with self._lock:
+                    self.retried += 1
+                if on_retry is not None:
+                    on_retry()
+
+    def _run_once(self, model_name: str, send: Callable[[Optional[float]], Dict],
+                  on_discarded: Optional[Callable[[Dict], float]]) -> Dict:
+        start = time.monotonic()
+        deadline = start + self.deadline_seconds if self.deadline_seconds is not None else None
+        primary = self._submit(model_name, send, self.deadline_seconds)
+        pending = {primary}
+        hedge_future = None
+        hedge_after = self.latencies.quantile(model_name, self.quantile) if self.hedge else None
+        error = None
+
+        while True:
+            now = time.monotonic()
+            wake = [t for t in (deadline, start + hedge_after if hedge_after is not None else None) if t is not None]
+            timeout = max(0.0, min(wake) - now) if wake else None
+            done, pending = concurrent.futures.wait(pending, timeout=timeout,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge_future:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    self._abandon(pending, on_discarded)
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                # Failures are not slowness; they are not hedged
+                raise error
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                with self._lock:
+                    self.deadline_exceeded += 1
+                self._abandon(pending, on_discarded)
+                self.log(f"[deadline] {model_name} call abandoned after {self.deadline_seconds:g}s")
+                raise DeadlineExceeded(f"{model_name} call exceeded {self.deadline_seconds:g}s deadline")
+
+            if hedge_after is not None and now - start >= hedge_after:
+                hedge_after = None
+                try:
+                    if self.budget_check is not None:
+                        self.budget_check(model_name)
+                except BudgetExceeded:
+                    with self._lock:
+                        self.hedges_skipped += 1
+                    continue
+                with self._lock:
+                    self.hedged += 1
+                self.log(f"[hedge] {model_name} call passed p{self.quantile * 100:.0f} "
+                         f"({now - start:.1f}s); sent a duplicate request ({self.hedged}/{self.calls} calls hedged)")
+                remaining = deadline - now if deadline is not None else None
+                hedge_future = self._submit(model_name, send, remaining)
+                pending.add(hedge_future)
+
+    def _abandon(self, pending, on_discarded: Optional[Callable[[Dict], float]]):
+        for future in pending:
+            if future.cancel():
+                continue
+
+            def discard(done):
+                if done.exception() is None and on_discarded is not None:
+                    cost = on_discarded(done.result())
+                    with self._lock:
+                        self.discarded_cost += cost or 0.0
+
+            future.add_done_callback(discard)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "deadline_seconds": self.deadline_seconds,
+                "hedge_quantile": self.quantile if self.hedge else None,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else None,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped_budget": self.hedges_skipped,
+                "deadline_exceeded": self.deadline_exceeded,
+                "retried": self.retried,
+                "discarded_cost_usd": round(self.discarded_cost, 6),
+            }
+
+    def close(self):
+        # Abandoned requests keep their threads until their own timeout; do not wait for them
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
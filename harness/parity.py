@@ -0,0 +1,114 @@
+import difflib
+import time
+from typing import Callable, Dict, Iterable, List
+
+from prompts.catalog import CATALOG
+from data.question_data import get_question
+from inference.registry import create_inference
+from inference.residency import release_memory
+
+# Minimum word-level similarity for a response pair to count as matching
+PARITY_THRESHOLD = 0.9
+
+
+def _similarity(reference: str, candidate: str) -> Dict:
+    ref_words, cand_words = reference.split(), candidate.split()
+    matcher = difflib.SequenceMatcher(None, ref_words, cand_words, autojunk=False)
+    first = matcher.get_matching_blocks()[0]
+    prefix = first.size if first.a == 0 and first.b == 0 else 0
+    return {
+        "exact": reference.strip() == candidate.strip(),
+        "similarity": round(matcher.ratio(), 4),
+        "common_prefix_words": prefix,
+    }
+
+
+def _run_backend(model_type: str, model_name: str, requests: List[Dict], max_new_tokens: int,
+                 warmup: int) -> Dict:
+    # One backend at a time, so two large models never share memory
+    start = time.perf_counter()
+    inference = create_inference(model_type, model_name)
+    load_seconds = time.perf_counter() - start
+    try:
+        for request in requests[:warmup]:
+            inference.generate(messages=request["messages"], images=request["images"],
+                               max_new_tokens=max_new_tokens, temperature=0.0)
+        responses, latencies, tokens = [], [], 0
+        for request in requests:
+            start = time.perf_counter()
+            result = inference.generate(messages=request["messages"], images=request["images"],
+                                        max_new_tokens=max_new_tokens, temperature=0.0)
+            latencies.append(time.perf_counter() - start)
+            responses.append(result["response"])
+            tokens += result.get("tokens_generated") or result.get("completion_tokens") or 0
+    finally:
+        inference.cleanup()
+        del inference
+        release_memory()
+    seconds = sum(latencies)
+    return {
+        "backend": model_type,
+        "load_seconds": round(load_seconds, 2),
+        "calls": len(requests),
+        "completion_tokens": tokens,
+        "seconds": round(seconds, 3),
+        "mean_latency_seconds": round(seconds / len(requests), 3) if requests else None,
+        "tokens_per_second": round(tokens / seconds, 2) if seconds else None,
+        "responses": responses,
+    }
+
+
+def compare_backends(model_name: str, reference: str, candidate: str, jobs: Iterable[Dict],
+                     build_messages: Callable[..., List[Dict]], max_new_tokens: int = 128,
+                     warmup: int = 1) -> Dict:
+    # Greedy decoding of the same prompts on two backends: response parity against the
+    # reference and throughput of each (warmup calls are excluded from the timings)
+    requests = []
+    for job in jobs:
+        system_prompt, user_prompt = CATALOG.prompts(job["learner_profile"], job["group"])
+        images = [get_question(job["question_id"])["image_path"]]
+        requests.append({
+            "job": f"{job['group']}_{job['learner_profile']}_{job['question_id']}",
+            "messages": build_messages(system_prompt, user_prompt, images, group=job["group"]),
+            "images": images,
+        })
+
+    runs = {name: _run_backend(name, model_name, requests, max_new_tokens, warmup)
+            for name in (reference, candidate)}
+    pairs = []
+    for i, request in enumerate(requests):
+        pairs.append({"job": request["job"],
+                      **_similarity(runs[reference]["responses"][i], runs[candidate]["responses"][i])})
+
+    reference_tps = runs[reference]["tokens_per_second"]
+    candidate_tps = runs[candidate]["tokens_per_second"]
+    return {
+        "model": model_name,
+        "reference": reference,
+        "candidate": candidate,
+        "max_new_tokens": max_new_tokens,
+        "parity": {
+            "exact_match_rate": round(sum(p["exact"] for p in pairs) / len(pairs), 3) if pairs else None,
+            "mean_similarity": round(sum(p["similarity"] for p in pairs) / len(pairs), 4) if pairs else None,
+            "matching_rate": round(sum(p["similarity"] >= PARITY_THRESHOLD for p in pairs) / len(pairs), 3) if pairs else None,
+            "pairs": pairs,
+        },
+        "throughput": {
+            name: {k: v for k, v in run.items() if k != "responses"} for name, run in runs.items()
+        },
+        "speedup": round(candidate_tps / reference_tps, 2) if reference_tps and candidate_tps else None,
+        "responses": {name: run["responses"] for name, run in runs.items()},
+    }
+
+
+def print_comparison(report: Dict):
+    parity = report["parity"]
+    print(f"\n{report['model']}: {report['candidate']} vs {report['reference']} "
+          f"({len(parity['pairs'])} prompts, greedy, max {report['max_new_tokens']} new tokens)")
+    print(f"  exact match {parity['exact_match_rate']}, mean word similarity {parity['mean_similarity']}, "
+          f">= {PARITY_THRESHOLD} similar: {parity['matching_rate']}")
+    for name, stats in report["throughput"].items():
+        print(f"  {name:<10} load {stats['load_seconds']}s  {stats['tokens_per_second']} tok/s  "
+              f"mean latency {stats['mean_latency_seconds']}s")
+    if report["speedup"] is not None:
+        print(f"  speedup: {report['speedup']}x")
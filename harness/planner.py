@@ -0,0 +1,34 @@
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from prompts.profiles import ProfileCohort, iter_profiles
+from data.question_data import get_questions_by_grade
+
+
+def iter_jobs(models: List[Dict], cohort: Optional[ProfileCohort] = None,
+              groups: Sequence[int] = (4,)) -> Iterator[Dict]:
+    # Stream the evaluation grid model -> profile -> question -> group without materializing it
+    for model_config in models:
+        for profile_id, learner_data in iter_profiles(cohort):
+            questions = get_questions_by_grade(learner_data["grade"])
+            for question_id in questions:
+                for group in groups:
+                    yield {
+                        "model_name": model_config["name"],
+                        "model_type": model_config["type"],
+                        "learner_profile": profile_id,
+                        "question_id": question_id,
+                        "group": group,
+                    }
+
+
+def count_jobs(models: List[Dict], cohort: Optional[ProfileCohort] = None,
+               groups: Sequence[int] = (4,)) -> int:
+    # Grid size from per-grade question counts (one pass over profiles, no job dicts)
+    questions_per_grade: Dict[int, int] = {}
+    per_model = 0
+    for _, learner_data in iter_profiles(cohort):
+        grade = learner_data["grade"]
+        if grade not in questions_per_grade:
+            questions_per_grade[grade] = len(get_questions_by_grade(grade))
+        per_model += questions_per_grade[grade]
+    return per_model * len(groups) * len(models)
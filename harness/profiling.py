@@ -0,0 +1,171 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class RunProfiler:
+    # Per-run profiling: a whole-harness CPU profile (cProfile or pyinstrument), torch.profiler
+    # traces for the first few local-model generate calls, and tracemalloc snapshots around
+    # named sections (image loading, result saving). Everything lands in one directory with a
+    # short hotspots.md report.
+
+    def __init__(self, out_dir: str, engine: str = "cprofile", max_torch_traces: int = 3,
+                 max_snapshots_per_section: int = 5):
+        if engine not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {engine}. Must be one of {PROFILERS}")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.engine = engine
+        self.max_torch_traces = max_torch_traces
+        self.max_snapshots_per_section = max_snapshots_per_section
+        self._lock = threading.Lock()
+        self._profiler = None
+        self.sections: Dict[str, Dict] = {}
+        self.torch_traces: List[Dict] = []
+
+    def start(self):
+        if self.engine == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("pyinstrument package is required. Install with: pip install pyinstrument")
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        tracemalloc.start(10)
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        # Wall time for every call; allocation diff (top lines) for the first few calls
+        with self._lock:
+            stats = self.sections.setdefault(name, {"calls": 0, "seconds": 0.0, "max_net_bytes": 0,
+                                                     "snapshots": 0, "top_allocations": []})
+            take_snapshot = stats["snapshots"] < self.max_snapshots_per_section and tracemalloc.is_tracing()
+            if take_snapshot:
+                stats["snapshots"] += 1
+        before = tracemalloc.take_snapshot() if take_snapshot else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            diff = tracemalloc.take_snapshot().compare_to(before, "lineno") if take_snapshot else None
+            with self._lock:
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                if diff is not None:
+                    net = sum(d.size_diff for d in diff)
+                    if net >= stats["max_net_bytes"]:
+                        stats["max_net_bytes"] = net
+                        stats["top_allocations"] = [str(d) for d in diff[:10]]
+
+    @contextlib.contextmanager
+    def torch_trace(self, name: str):
+        # torch.profiler around one call (CPU + CUDA when available); only the first few calls
+        with self._lock:
+            index = len(self.torch_traces)
+            traced = index < self.max_torch_traces
+            if traced:
+                self.torch_traces.append({"name": name})
+        if not traced:
+            yield
+            return
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, profile_memory=True, record_shapes=False) as prof:
+            yield
+        trace_path = self.out_dir / f"torch_{name}_{index}.json"
+        prof.export_chrome_trace(str(trace_path))
+        sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        self.torch_traces[index].update({
+            "trace": trace_path.name,
+            "top_ops": prof.key_averages().table(sort_by=sort_by, row_limit=15),
+        })
+
+    def stop(self) -> Path:
+        # Write the CPU profile and the hotspot report; returns the report path
+        cpu_report = ""
+        if self.engine == "pyinstrument":
+            self._profiler.stop()
+            (self.out_dir / "harness.html").write_text(self._profiler.output_html(), encoding='utf-8')
+            cpu_report = self._profiler.output_text(unicode=True, color=False, show_all=False)
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(str(self.out_dir / "harness.prof"))
+            for sort_key in ("cumulative", "tottime"):
+                buffer = io.StringIO()
+                pstats.Stats(self._profiler, stream=buffer).strip_dirs().sort_stats(sort_key).print_stats(15)
+                cpu_report += f"Top functions by {sort_key}:\n{buffer.getvalue()}\n"
+        tracemalloc.stop()
+
+        lines = [f"# Run profile ({datetime.now().isoformat(timespec='seconds')})", "",
+                 f"## Harness CPU ({self.engine})", "", "```", cpu_report.strip(), "```", ""]
+        lines += ["## Sections", "", "| section | calls | total s | mean ms | max net alloc KiB |", "|---|---|---|---|---|"]
+        for name, stats in sorted(self.sections.items(), key=lambda item: -item[1]["seconds"]):
+            mean_ms = 1000 * stats["seconds"] / stats["calls"] if stats["calls"] else 0.0
+            lines.append(f"| {name} | {stats['calls']} | {stats['seconds']:.3f} | {mean_ms:.1f} | "
+                         f"{stats['max_net_bytes'] / 1024:.1f} |")
+        for name, stats in self.sections.items():
+            if stats["top_allocations"]:
+                lines += ["", f"### Top allocations: {name}", "", "```"] + stats["top_allocations"] + ["```"]
+        for trace in self.torch_traces:
+            if "top_ops" in trace:
+                lines += ["", f"## torch.profiler: {trace['name']} ({trace['trace']})", "", "```",
+                          trace["top_ops"], "```"]
+
+        report_path = self.out_dir / "hotspots.md"
+        report_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        return report_path
+
+
+_active: Optional[RunProfiler] = None
+
+
+def start_run_profile(out_dir: str, engine: str = "cprofile") -> RunProfiler:
+    global _active
+    _active = RunProfiler(out_dir, engine=engine)
+    _active.start()
+    return _active
+
+
+def stop_run_profile() -> Optional[Path]:
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    return profiler.stop()
+
+
+def profile_section(name: str):
+    # Timed + tracemalloc'd section when a run profile is active, otherwise a no-op
+    return _active.section(name) if _active is not None else contextlib.nullcontext()
+
+
+def torch_profile(name: str):
+    return _active.torch_trace(name) if _active is not None else contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def profiled_run(out_dir: str, engine: Optional[str] = None):
+    # Profile everything inside the block when engine is set (--profile-run)
+    if engine is None:
+        yield None
+        return
+    profiler = start_run_profile(out_dir, engine=engine)
+    try:
+        yield profiler
+    finally:
+        print(f"Profile report: {stop_run_profile()}")
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+PROGRESS_MODES = ("auto", "live", "log", "off")
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m" if hours else f"{rest // 60}m{rest % 60:02d}s"
+
+
+class _AboveFrameStream:
+    # Stands in for stdout/stderr while the live view is drawn: complete lines are written above
+    # the frame (the frame is cleared, the text written, the frame redrawn), so banners, warnings
+    # and library output never land inside it. Partial lines wait for their newline.
+
+    def __init__(self, tracker: "ProgressTracker", stream):
+        self._tracker = tracker
+        self._stream = stream
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        self._partial += text
+        if "\n" in self._partial:
+            complete, _, self._partial = self._partial.rpartition("\n")
+            self._tracker._write_above(complete + "\n")
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def close_partial(self):
+        if self._partial:
+            self._tracker._write_above(self._partial + "\n")
+            self._partial = ""
+
+    def isatty(self) -> bool:
+        return self._stream.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ProgressTracker:
+    # Run progress for long sweeps: completed/failed/in-flight jobs, windowed jobs/sec and
+    # tokens/sec per provider, cache hits and ETA. A background ticker redraws a live terminal
+    # view (or prints a status line in log mode) and rewrites a JSON status file for schedulers.
+    # The ticker keeps running while calls are stuck, so a hung run shows in-flight ages growing
+    # while a throttled one still completes jobs slowly.
+
+    def __init__(self, status_path: Optional[str] = None, mode: str = "auto", refresh_seconds: float = 1.0,
+                 log_every_seconds: float = 30.0, window_seconds: float = 60.0, stream=None):
+        self.stream = stream or sys.stdout
+        if mode == "auto":
+            mode = "live" if self.stream.isatty() else "log"
+        self.mode = mode
+        self.status_path = Path(status_path) if status_path else None
+        self.refresh_seconds = refresh_seconds
+        self.log_every_seconds = log_every_seconds
+        self.window_seconds = window_seconds
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._drawn_lines = 0
+        self._frame: list = []
+        self._draw_lock = threading.Lock()
+        self._redirected: list = []  # (restore callable) while live mode owns stdout/stderr
+        self._last_log = 0.0
+
+        self.total: Optional[int] = None
+        self.state = "pending"
+        self.started_at: Optional[float] = None
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.cancelled = 0
+        self.cache_hits = 0
+        self.last_error: Optional[str] = None
+        self._next_token = 0
+        self._in_flight: Dict[int, tuple] = {}
+        self._recent = deque()  # (finish time, provider, tokens)
+        self.providers: Dict[str, Dict] = {}
+
+    @property
+    def live(self) -> bool:
+        return self.mode == "live"
+
+    # Events
+
+    def set_total(self, total: Optional[int]):
+        with self._lock:
+            self.total = total
+
+    def job_started(self, label: str) -> int:
+        with self._lock:
+            self._next_token += 1
+            self._in_flight[self._next_token] = (label, time.time())
+            return self._next_token
+
+    def job_finished(self, token: int, provider: str, metadata: Dict):
+        now = time.time()
+        tokens = (metadata.get("prompt_tokens") or 0) + (
+            metadata.get("completion_tokens") or metadata.get("tokens_generated") or 0)
+        # Served without a new prefill/request: deduplicated results or cached processed inputs
+        cache_hit = bool(metadata.get("shared") or metadata.get("input_cache_hit"))
+        with self._lock:
+            self._in_flight.pop(token, None)
+            self.completed += 1
+            self.cache_hits += cache_hit
+            provider_stats = self.providers.setdefault(provider, {"calls": 0, "tokens": 0, "cached_tokens": 0})
+            provider_stats["calls"] += 1
+            provider_stats["tokens"] += tokens
+            provider_stats["cached_tokens"] += metadata.get("cached_tokens") or 0
+            self._recent.append((now, provider, tokens))
+
+    def job_failed(self, token: int, error: BaseException):
+        with self._lock:
+            self._in_flight.pop(token, None)
+            self.failed += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def job_dropped(self, token: int):
+        # Started but never sent (e.g. refused by the budget check); counted via jobs_cancelled
+        with self._lock:
+            self._in_flight.pop(token, None)
+
+    def job_retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def jobs_cancelled(self, count: int):
+        with self._lock:
+            self.cancelled += count
+
+    # Reporting
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            while self._recent and now - self._recent[0][0] > self.window_seconds:
+                self._recent.popleft()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            window = min(self.window_seconds, elapsed) or None
+            jobs_per_second = len(self._recent) / window if window else None
+            window_tokens: Dict[str, int] = {}
+            for _, provider, tokens in self._recent:
+                window_tokens[provider] = window_tokens.get(provider, 0) + tokens
+
+            done = self.completed + self.failed + self.cancelled
+            remaining = self.total - done if self.total is not None else None
+            eta = remaining / jobs_per_second if remaining is not None and jobs_per_second else None
+            in_flight = sorted(((label, now - start) for label, start in self._in_flight.values()),
+                               key=lambda item: -item[1])
+            return {
+                "state": self.state,
+                "updated_at": datetime.now().isoformat(),
+                "elapsed_seconds": round(elapsed, 1),
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "retries": self.retries,
+                "in_flight": len(in_flight),
+                "oldest_in_flight": {"job": in_flight[0][0], "age_seconds": round(in_flight[0][1], 1)} if in_flight else None,
+                "jobs_per_second": round(jobs_per_second, 3) if jobs_per_second is not None else None,
+                "cache_hit_rate": round(self.cache_hits / self.completed, 3) if self.completed else None,
+                "eta_seconds": round(eta) if eta is not None else None,
+                "providers": {
+                    provider: {
+                        **stats,
+                        "tokens_per_second": round(window_tokens.get(provider, 0) / window, 1) if window else None,
+                    }
+                    for provider, stats in self.providers.items()
+                },
+                "last_error": self.last_error,
+            }
+
+    def _render(self, status: Dict) -> list:
+        total = status["total"] if status["total"] is not None else "?"
+        rate = status["jobs_per_second"]
+        hit_rate = status["cache_hit_rate"]
+        lines = [
+            f"[{status['state']}] {status['completed']}/{total} done, {status['failed']} failed, "
+            f"{status['cancelled']} cancelled, {status['retries']} retries, {status['in_flight']} in flight",
+            f"  {rate if rate is not None else '--'} jobs/s  ETA {_format_eta(status['eta_seconds'])}  "
+            f"cache hits {f'{hit_rate:.0%}' if hit_rate is not None else '--'}  elapsed {_format_eta(status['elapsed_seconds'])}",
+        ]
+        for provider, stats in sorted(status["providers"].items()):
+            tps = stats["tokens_per_second"]
+            lines.append(f"  {provider:<8} {stats['calls']} calls  {tps if tps is not None else '--'} tok/s  "
+                         f"{stats['cached_tokens']} cached tokens")
+        if status["oldest_in_flight"]:
+            oldest = status["oldest_in_flight"]
+            lines.append(f"  oldest in flight: {oldest['job']} ({oldest['age_seconds']:.0f}s)")
+        if status["last_error"]:
+            lines.append(f"  last error: {status['last_error'][:120]}")
+        return lines
+
+    def _write_status(self, status: Dict):
+        if self.status_path is None:
+            return
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.status_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp_path, self.status_path)
+
+    def _tick(self, final: bool = False):
+        status = self.snapshot()
+        self._write_status(status)
+        if self.mode == "live":
+            with self._draw_lock:
+                self._clear_frame()
+                self._frame = self._render(status)
+                self._draw_frame()
+        elif self.mode == "log" and (final or time.time() - self._last_log >= self.log_every_seconds):
+            self._last_log = time.time()
+            print(" | ".join(line.strip() for line in self._render(status)), file=self.stream, flush=True)
+
+    def _clear_frame(self):
+        if self._drawn_lines:
+            # Move back over the previous frame and clear it
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self._drawn_lines = 0
+
+    def _draw_frame(self):
+        if self._frame:
+            self.stream.write("\n".join(self._frame) + "\n")
+        self.stream.flush()
+        self._drawn_lines = len(self._frame)
+
+    def _write_above(self, text: str):
+        with self._draw_lock:
+            self._clear_frame()
+            self.stream.write(text)
+            self._draw_frame()
+
+    def _take_over_output(self):
+        # Everything else that would write to the terminal goes through the frame: sys.stdout,
+        # sys.stderr and logging handlers (e.g. transformers') bound to them
+        originals = (sys.stdout, sys.stderr)
+        for name in ("stdout", "stderr"):
+            original = getattr(sys, name)
+            setattr(sys, name, _AboveFrameStream(self, original))
+            self._redirected.append(lambda name=name, original=original: setattr(sys, name, original))
+        loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                           if isinstance(logger, logging.Logger)]
+        for logger in loggers:
+            for handler in logger.handlers:
+                if type(handler) is logging.StreamHandler and handler.stream in originals:
+                    original = handler.stream
+                    handler.setStream(_AboveFrameStream(self, original))
+                    self._redirected.append(lambda handler=handler, original=original: handler.setStream(original))
+
+    def _restore_output(self):
+        for name in ("stdout", "stderr"):
+            stream = getattr(sys, name)
+            if isinstance(stream, _AboveFrameStream):
+                stream.close_partial()
+        while self._redirected:
+            self._redirected.pop()()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            self._tick()
+
+    def start(self):
+        self.started_at = time.time()
+        self.state = "running"
+        if self.mode == "live":
+            self._take_over_output()
+        if self.mode != "off" or self.status_path is not None:
+            self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+            self._thread.start()
+
+    def stop(self, state: str = "done"):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.state = state
+        self._tick(final=True)
+        self._restore_output()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.stop("cancelled" if self.cancelled else "done")
+        else:
+            self.stop("interrupted" if exc_type is KeyboardInterrupt else "failed")
+        return False
@@ -0,0 +1,143 @@
+import math
+import re
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+# Two-sided 95% Student-t critical values by degrees of freedom (normal approximation beyond 30)
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+    18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+    26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+}
+
+
+def _words(text: str) -> float:
+    return float(len(text.split()))
+
+
+def _chars(text: str) -> float:
+    return float(len(text))
+
+
+def _sentences(text: str) -> float:
+    return float(len([s for s in re.split(r"[.!?]+", text) if s.strip()]))
+
+
+# Per-response metrics the sampler can track; values must be numeric
+SAMPLE_METRICS: Dict[str, Callable[[str], float]] = {
+    "words": _words,
+    "chars": _chars,
+    "sentences": _sentences,
+}
+
+
+class CellStats:
+    # Running mean/variance (Welford) for one evaluation cell
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else float("inf")
+
+    def half_width(self) -> float:
+        # 95% confidence interval half-width of the mean
+        if self.n < 2:
+            return float("inf")
+        t = T_CRITICAL_95.get(self.n - 1, 1.96)
+        return t * self.std / math.sqrt(self.n)
+
+    def relative_half_width(self) -> float:
+        if self.n < 2:
+            return float("inf")
+        half_width = self.half_width()
+        if self.mean == 0:
+            return 0.0 if half_width == 0 else float("inf")
+        return half_width / abs(self.mean)
+
+
+class AdaptiveSampler:
+    # Decides which cell to sample next: every cell first gets min_samples, then the remaining
+    # budget goes to the unconverged cell with the widest relative confidence interval.
+    # A cell stops once its CI half-width is within rel_tolerance of the mean or it hits max_samples.
+
+    def __init__(self, cells: Iterable[Hashable], min_samples: int = 3, max_samples: int = 20,
+                 rel_tolerance: float = 0.1, budget: Optional[int] = None):
+        if min_samples < 2:
+            raise ValueError("min_samples must be at least 2 to estimate variance")
+        self.stats: Dict[Hashable, CellStats] = {cell: CellStats() for cell in cells}
+        self.min_samples = min_samples
+        self.max_samples = max(max_samples, min_samples)
+        self.rel_tolerance = rel_tolerance
+        self.budget = budget
+        self.draws = 0
+        # Draws per cell; differs from the sample count when one draw yields several values
+        self.cell_draws: Dict[Hashable, int] = {cell: 0 for cell in self.stats}
+        # Cells given up on (e.g. calls that keep missing their deadline) are never drawn again
+        self.exhausted = set()
+
+    def converged(self, cell: Hashable) -> bool:
+        stats = self.stats[cell]
+        return stats.n >= self.min_samples and stats.relative_half_width() <= self.rel_tolerance
+
+    def active(self, cell: Hashable) -> bool:
+        stats = self.stats[cell]
+        return stats.n < self.max_samples and not self.converged(cell) and cell not in self.exhausted
+
+    def exhaust(self, cell: Hashable):
+        self.exhausted.add(cell)
+
+    def next_cell(self) -> Optional[Hashable]:
+        if self.budget is not None and self.draws >= self.budget:
+            return None
+        # Warm-up: fewest samples first so every cell reaches min_samples
+        warming = [cell for cell, stats in self.stats.items()
+                   if stats.n < self.min_samples and cell not in self.exhausted]
+        if warming:
+            return min(warming, key=lambda cell: self.stats[cell].n)
+        active = [cell for cell in self.stats if self.active(cell)]
+        if not active:
+            return None
+        return max(active, key=lambda cell: self.stats[cell].relative_half_width())
+
+    def record(self, cell: Hashable, values: List[float]):
+        # One draw may yield several values (e.g. --samples); it counts once against the budget
+        self.draws += 1
+        self.cell_draws[cell] += 1
+        for value in values:
+            self.stats[cell].add(value)
+
+    def samples(self, cell: Hashable) -> int:
+        return self.stats[cell].n
+
+    def summary(self) -> Dict:
+        cells = []
+        for cell, stats in self.stats.items():
+            cells.append({
+                "cell": cell,
+                "samples": stats.n,
+                "mean": stats.mean,
+                "std": stats.std if stats.n > 1 else None,
+                "ci95_half_width": stats.half_width() if stats.n > 1 else None,
+                "converged": self.converged(cell),
+                "exhausted": cell in self.exhausted,
+            })
+        return {
+            "draws": self.draws,
+            "budget": self.budget,
+            "min_samples": self.min_samples,
+            "max_samples": self.max_samples,
+            "rel_tolerance": self.rel_tolerance,
+            "converged_cells": sum(1 for c in cells if c["converged"]),
+            "exhausted_cells": len(self.exhausted),
+            "cells": cells,
+        }
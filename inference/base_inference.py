@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+from data.image_shards import is_shard_ref, get_shard_reader, SHARD_SCHEME
+
+
+class BaseInference(ABC):
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def generate(
+        self,
+        messages: List[Dict],
+        images: Optional[List[str]] = None,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> Dict:
+        pass
+
+    @abstractmethod
+    def load_model(self):
+        pass
+
+    def cleanup(self):
+        # Release whatever the backend holds (weights, provider-side caches); safe to call twice
+        pass
+
+
+def load_image(image_path: str) -> str:
+    if image_path.startswith('http') or is_shard_ref(image_path):
+        return image_path
+    return str(Path(image_path).absolute())
+
+
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+
+def read_image_bytes(image_path: str) -> bytes:
+    # Raw image bytes from a packed shard (shard://<key>) or a local file
+    if is_shard_ref(image_path):
+        return get_shard_reader().read(image_path[len(SHARD_SCHEME):])
+    with open(image_path, "rb") as f:
+        return f.read()
+
+
+def image_mime_type(image_path: str) -> str:
+    if is_shard_ref(image_path):
+        suffix = get_shard_reader().suffix(image_path[len(SHARD_SCHEME):])
+    else:
+        suffix = Path(image_path).suffix.lower()
+    return MIME_TYPES.get(suffix, "image/jpeg")
+
+
+def open_image(image_path: str):
+    # PIL image for a shard reference or local file
+    from PIL import Image
+    if is_shard_ref(image_path):
+        return Image.open(io.BytesIO(read_image_bytes(image_path)))
+    return Image.open(image_path)
+
+
+@lru_cache(maxsize=4096)
+def _file_digest(image_path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_digest(image_path: str) -> str:
+    # sha256 of image content (of the URL for remote images); shards store it at pack time
+    if image_path.startswith('http'):
+        return hashlib.sha256(image_path.encode('utf-8')).hexdigest()
+    if is_shard_ref(image_path):
+        return get_shard_reader().sha256(image_path[len(SHARD_SCHEME):])
+    stat = os.stat(image_path)
+    return _file_digest(image_path, stat.st_mtime_ns, stat.st_size)
+
+
+def cpu_threads() -> int:
+    # CPUs this process may run on; respects taskset/cgroup affinity, unlike os.cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional
+
+from .openai_inference import OpenAInference
+from config import LOCAL_ENDPOINT, MODEL_ALIASES
+
+_settings: Dict = {**LOCAL_ENDPOINT, "aliases": dict(MODEL_ALIASES)}
+
+
+def configure_endpoint(base_url: Optional[str] = None, api_key: Optional[str] = None,
+                       aliases: Optional[Dict[str, str]] = None) -> Dict:
+    # Override config.LOCAL_ENDPOINT / MODEL_ALIASES for backends created afterwards
+    if base_url:
+        _settings["base_url"] = base_url
+    if api_key:
+        _settings["api_key"] = api_key
+    if aliases:
+        _settings["aliases"].update(aliases)
+    return dict(_settings)
+
+
+def parse_aliases(values: Optional[List[str]]) -> Dict[str, str]:
+    # "harness/name=served-id" pairs from the CLI
+    aliases = {}
+    for value in values or []:
+        name, sep, served = value.partition("=")
+        if not sep or not name or not served:
+            raise ValueError(f"Model alias must look like NAME=SERVED_ID, got: {value}")
+        aliases[name] = served
+    return aliases
+
+
+class EndpointInference(OpenAInference):
+    # The local models served by an OpenAI-compatible engine (llama.cpp server, vLLM, SGLang, a
+    # stub). Requests go through the same pooled HTTP client, prompt layout and sampling path as
+    # the OpenAI backend; results and costs keep the harness model name, while the request
+    # carries the served id from the alias table.
+    upload_provider = None
+    send_max_tokens = True
+
+    def __init__(self, model_name: str, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        super().__init__(model_name, api_key=api_key or _settings["api_key"],
+                         base_url=base_url or _settings["base_url"])
+        self.served_model = _settings["aliases"].get(model_name, model_name)
+
+    def load_model(self):
+        # Fail early when the server is down; a missing id is only a warning since some servers
+        # (llama.cpp) answer for any model name
+        served = [model.id for model in self.client.models.list()]
+        if self.served_model not in served:
+            print(f"[WARN] {self.base_url} does not list {self.served_model} (serves: {', '.join(served) or 'none'}); "
+                  f"map it with --model-alias {self.model_name}=<id>")
+
+    def generate(
+        self,
+        messages: List[Dict],
+        images: Optional[List[str]] = None,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> Dict:
+        result = super().generate(messages, images=images, max_new_tokens=max_new_tokens,
+                                  temperature=temperature, **kwargs)
+        # Servers without n return a single choice; top up with single-sample requests, which
+        # their prefix caches serve without a second prefill
+        num_samples = kwargs.get("num_samples", 1)
+        while len(result["responses"]) < num_samples:
+            extra = super().generate(messages, images=images, max_new_tokens=max_new_tokens,
+                                     temperature=temperature, **{**kwargs, "num_samples": 1})
+            result["responses"].append(extra["response"])
+            for field in ("tokens_used", "prompt_tokens", "completion_tokens", "cached_tokens"):
+                result[field] = (result.get(field) or 0) + (extra.get(field) or 0)
+        return result
+
+
+def create_endpoint_inference(model_name: str, base_url: Optional[str] = None,
+                              api_key: Optional[str] = None) -> EndpointInference:
+    inference = EndpointInference(model_name, base_url=base_url, api_key=api_key)
+    inference.load_model()
+    return inference
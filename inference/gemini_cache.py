@@ -0,0 +1,117 @@
+import atexit
+import datetime
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .base_inference import image_digest, load_image
+
+# Prefix of the display names of caches created here, so leftovers can be found and purged
+CACHE_DISPLAY_PREFIX = "alb-"
+# Extend a cache's TTL when it has less than this left, so in-flight requests never hit an expired cache
+TTL_REFRESH_MARGIN_SECONDS = 300
+
+_managers: List["GeminiContextCaches"] = []
+
+
+class GeminiContextCaches:
+    # Explicit Gemini context caches, one per distinct (system instruction, images) prefix. The
+    # system prompt is fixed by grade and group, so this is one cache per (grade, group, question);
+    # only the learner-specific user text is sent with each call.
+
+    def __init__(self, genai, model_name: str, ttl_seconds: int = 3600):
+        self.genai = genai
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._caches: Dict[str, object] = {}
+        self._models: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        # Prefixes the API refused to cache (e.g. below the minimum token count)
+        self._uncacheable = set()
+        self.created = 0
+        self.hits = 0
+        _managers.append(self)
+
+    def key(self, system_text: str, images: List[str]) -> str:
+        payload = "\n".join([self.model_name, system_text] + [image_digest(load_image(img)) for img in images])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def model_for(self, system_text: str, images: List[str], load_parts: Callable[[], List]) -> Optional[object]:
+        # GenerativeModel bound to the cache for this prefix, or None to send the request uncached;
+        # images are only loaded (load_parts) when a new cache has to be created
+        key = self.key(system_text, images)
+        with self._lock:
+            if key in self._uncacheable:
+                return None
+            now = time.time()
+            if key in self._caches:
+                if self._expires[key] - now < TTL_REFRESH_MARGIN_SECONDS:
+                    self._caches[key].update(ttl=datetime.timedelta(seconds=self.ttl_seconds))
+                    self._expires[key] = now + self.ttl_seconds
+                self.hits += 1
+                return self._models[key]
+            try:
+                cache = self.genai.caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    display_name=f"{CACHE_DISPLAY_PREFIX}{key[:24]}",
+                    system_instruction=system_text,
+                    contents=[{"role": "user", "parts": load_parts()}],
+                    ttl=datetime.timedelta(seconds=self.ttl_seconds),
+                )
+            except Exception as e:
+                print(f"[WARN] Gemini context cache not created ({e}); sending this prefix uncached")
+                self._uncacheable.add(key)
+                return None
+            self._caches[key] = cache
+            self._models[key] = self.genai.GenerativeModel.from_cached_content(cached_content=cache)
+            self._expires[key] = now + self.ttl_seconds
+            self.created += 1
+            return self._models[key]
+
+    def cleanup(self):
+        # Delete every cache this instance created (they would otherwise live until their TTL)
+        with self._lock:
+            for key, cache in list(self._caches.items()):
+                try:
+                    cache.delete()
+                except Exception as e:
+                    print(f"[WARN] Failed to delete Gemini context cache {key[:12]}: {e}")
+            self._caches.clear()
+            self._models.clear()
+            self._expires.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"created": self.created, "hits": self.hits, "uncacheable": len(self._uncacheable)}
+
+
+@atexit.register
+def cleanup_context_caches():
+    for manager in _managers:
+        manager.cleanup()
+
+
+def purge_context_caches(genai) -> int:
+    # Delete caches left behind by interrupted runs (matched by display name prefix)
+    deleted = 0
+    for cache in genai.caching.CachedContent.list():
+        if (getattr(cache, "display_name", "") or "").startswith(CACHE_DISPLAY_PREFIX):
+            cache.delete()
+            deleted += 1
+    return deleted
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import dotenv
+    import google.generativeai as genai
+
+    parser = argparse.ArgumentParser(description="Delete Gemini context caches left by earlier benchmark runs")
+    parser.add_argument("--api-key", type=str, help="Defaults to GOOGLE_API_KEY")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    genai.configure(api_key=args.api_key or os.getenv("GOOGLE_API_KEY"))
+    print(f"Deleted {purge_context_caches(genai)} context cache(s)")
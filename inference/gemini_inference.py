@@ -2,7 +2,11 @@ import os
 import base64
 from typing import Dict, List, Optional
 from pathlib import Path
-from .base_inference import BaseInference, load_image
+from .base_inference import BaseInference, load_image, open_image
+from .uploads import get_upload_cache, is_stale_reference_error
+from .gemini_cache import GeminiContextCaches
+from harness.profiling import profile_section
+from config import GEMINI_CACHE_TTL_SECONDS
 import dotenv
 dotenv.load_dotenv()
 
@@ -11,6 +15,16 @@ try:
 except ImportError:
     genai = None
 
+# genai.configure rebuilds the SDK's process-wide client; only do it when the key changes
+_configured_key: Optional[str] = None
+
+
+def _configure(api_key: Optional[str]):
+    global _configured_key
+    if api_key != _configured_key:
+        genai.configure(api_key=api_key)
+        _configured_key = api_key
+
 class GeminiInference(BaseInference):
     SUPPORTED_MODELS = [
         "gemini-2.5-flash",
@@ -21,12 +35,24 @@ class GeminiInference(BaseInference):
         if genai is None:
             raise ImportError("google-generativeai package is required. Install with: pip install google-generativeai")
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=self.api_key)
+        _configure(self.api_key)
         self.model = genai.GenerativeModel(model_name)
+        # One model per distinct system instruction (there are only a few: grade x group)
+        self._instructed_models: Dict[str, object] = {"": self.model}
+        self.context_caches: Optional[GeminiContextCaches] = None
     
     def load_model(self):
         pass
     
+    def cleanup(self):
+        if self.context_caches is not None:
+            self.context_caches.cleanup()
+    
+    def _model_for(self, system_text: str):
+        if system_text not in self._instructed_models:
+            self._instructed_models[system_text] = genai.GenerativeModel(self.model_name, system_instruction=system_text)
+        return self._instructed_models[system_text]
+    
     def _load_image_for_gemini(self, image_path: str):
         """Load image for Gemini API."""
         img_path = load_image(image_path)
@@ -40,12 +66,40 @@ class GeminiInference(BaseInference):
                 image_data = response.read()
             return Image.open(io.BytesIO(image_data))
         else:
-            # Local file
-            from PIL import Image
-            return Image.open(img_path)
+            # Local file or shard entry
+            return open_image(img_path)
+    
+    def _image_parts(self, images: List[str]) -> List:
+        # File API references when uploads are enabled, otherwise inline images
+        uploads = get_upload_cache("gemini")
+        parts = []
+        with profile_section("image_loading"):
+            for img in images:
+                img_path = load_image(img)
+                if uploads is not None and not img_path.startswith('http'):
+                    ref = uploads.reference(img_path)
+                    parts.append(genai.protos.Part(
+                        file_data=genai.protos.FileData(mime_type=ref["mime_type"], file_uri=ref["uri"])
+                    ))
+                else:
+                    parts.append(self._load_image_for_gemini(img_path))
+        return parts
     
     def generate(self, messages: List[Dict], images: Optional[List[str]] = None,
                  max_new_tokens: int = 512, temperature: float = 0.7, **kwargs) -> Dict:
+        try:
+            return self._generate(messages, images, max_new_tokens, temperature, **kwargs)
+        except Exception as e:
+            uploads = get_upload_cache("gemini")
+            if uploads is None or not images or not is_stale_reference_error(e):
+                raise
+            # An uploaded image is past its TTL or was deleted: upload it again and retry once
+            for img in images:
+                uploads.invalidate(img)
+            return self._generate(messages, images, max_new_tokens, temperature, **kwargs)
+    
+    def _generate(self, messages: List[Dict], images: Optional[List[str]], max_new_tokens: int,
+                  temperature: float, **kwargs) -> Dict:
         # Build content for Gemini
         content_parts = []
         
@@ -62,27 +116,34 @@ class GeminiInference(BaseInference):
             elif role == "user":
                 user_text = content
         
-        # Combine system and user text
-        full_prompt = ""
-        if system_text:
-            full_prompt = f"{system_text}\n\n{user_text}"
-        else:
-            full_prompt = user_text
-        
-        content_parts.append(full_prompt)
+        model = None
+        if kwargs.get("context_cache") and system_text and images:
+            # System instruction + image come from an explicit context cache; only the learner text is sent
+            if self.context_caches is None:
+                self.context_caches = GeminiContextCaches(genai, self.model_name, ttl_seconds=GEMINI_CACHE_TTL_SECONDS)
+            model = self.context_caches.model_for(system_text, images, lambda: self._image_parts(images))
+            if model is not None:
+                content_parts.append(user_text)
         
-        # Add images
-        if images:
-            for img in images:
-                pil_image = self._load_image_for_gemini(img)
-                content_parts.append(pil_image)
+        if model is None:
+            model = self._model_for(system_text)
+            image_parts = self._image_parts(images or [])
+            # The system prompt goes in system_instruction; with cache_layout the image precedes the text
+            text_parts = [user_text] if user_text else []
+            if kwargs.get("cache_layout"):
+                content_parts.extend(image_parts + text_parts)
+            else:
+                content_parts.extend(text_parts + image_parts)
         
         # Configure generation - increase max_output_tokens to allow longer responses
         # Gemini 2.5 Pro supports up to 8192 output tokens
         max_tokens = max(max_new_tokens, 4096)
+        # Several samples from one request: the prompt and image are sent and prefilled once
+        num_samples = kwargs.get("num_samples", 1)
         generation_config = genai.types.GenerationConfig(
             max_output_tokens=max_tokens,
             temperature=temperature,
+            candidate_count=num_samples,
         )
         
         if kwargs.get("top_p"):
@@ -90,10 +151,12 @@ class GeminiInference(BaseInference):
         if kwargs.get("top_k"):
             generation_config.top_k = kwargs.get("top_k")
         
-        # Call Gemini API
-        response = self.model.generate_content(
+        # Call Gemini API (timeout: the harness's per-call deadline, if any)
+        request_options = {"timeout": kwargs["timeout"]} if kwargs.get("timeout") else None
+        response = model.generate_content(
             content_parts,
-            generation_config=generation_config
+            generation_config=generation_config,
+            request_options=request_options
         )
         
         # Debug logging to inspect raw response structure when Gemini returns no text
@@ -106,45 +169,48 @@ class GeminiInference(BaseInference):
         #     print(f"[GEMINI DEBUG] Candidate {idx} safety_ratings: {safety}")
         
         # Extract response text safely (Gemini may return no Parts when finish_reason != OK)
-        response_text = ""
+        candidates = getattr(response, "candidates", None) or []
+        responses = []
         try:
-            # Try the standard text accessor first
-            if hasattr(response, "text") and response.text:
-                response_text = response.text
+            if len(candidates) <= 1 and hasattr(response, "text") and response.text:
+                # Try the standard text accessor first
+                responses = [response.text]
             else:
-                # Fallback: try to extract from candidates directly
-                if candidates:
-                    candidate = candidates[0]
+                # Multiple candidates (or no quick text): extract from each candidate directly
+                for candidate in candidates:
+                    text_parts = []
                     if hasattr(candidate, "content") and candidate.content:
-                        parts = getattr(candidate.content, "parts", [])
-                        text_parts = []
-                        for part in parts:
+                        for part in getattr(candidate.content, "parts", []):
                             if hasattr(part, "text"):
                                 text_parts.append(part.text)
-                        if text_parts:
-                            response_text = "".join(text_parts)
+                    responses.append("".join(text_parts))
         except Exception as e:
             # Fall back to empty string if quick accessor fails
             print(f"[ERROR] Failed to extract response text: {e}")
-            response_text = ""
+            responses = []
+        response_text = responses[0] if responses else ""
         
         # Get token counts if available
         tokens_used = None
         prompt_tokens = None
         completion_tokens = None
+        cached_tokens = 0
         
         if hasattr(response, "usage_metadata"):
             prompt_tokens = getattr(response.usage_metadata, "prompt_token_count", None)
             completion_tokens = getattr(response.usage_metadata, "candidates_token_count", None)
+            cached_tokens = getattr(response.usage_metadata, "cached_content_token_count", None) or 0
             if prompt_tokens is not None and completion_tokens is not None:
                 tokens_used = prompt_tokens + completion_tokens
         
         return {
             "response": response_text,
+            "responses": responses or [response_text],
             "model": self.model_name,
             "tokens_used": tokens_used,
             "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens
         }
 
 
@@ -0,0 +1,140 @@
+import base64
+import time
+from typing import Dict, List, Optional
+
+from .base_inference import BaseInference, cpu_threads, load_image, read_image_bytes, image_mime_type
+from harness.profiling import profile_section
+from config import GGUF, GGUF_MODELS
+
+try:
+    import llama_cpp
+    from llama_cpp import llama_chat_format
+except ImportError:
+    llama_cpp = None
+    llama_chat_format = None
+
+
+class GGUFInference(BaseInference):
+    # Quantized GGUF checkpoints of the local vision models through llama.cpp (llama-cpp-python).
+    # Weights are memory-mapped, so a Q4 model needs a fraction of the RAM of the bf16 HF path.
+    # The chat handler applies the model's chat template and projects images through the
+    # mmproj file. Extra samples reuse the KV cache of the evaluated prompt instead of running
+    # the image projection and prefill again.
+
+    def __init__(self, model_name: str, n_ctx: int = GGUF["n_ctx"], n_batch: int = GGUF["n_batch"],
+                 threads: Optional[int] = GGUF["threads"]):
+        super().__init__(model_name)
+        if model_name not in GGUF_MODELS:
+            raise ValueError(f"No GGUF build configured for {model_name}. Available: {', '.join(GGUF_MODELS)}")
+        self.config = GGUF_MODELS[model_name]
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+        self.threads = threads or cpu_threads()
+        self.model = None
+
+    def load_model(self):
+        if llama_cpp is None:
+            raise ImportError("llama-cpp-python package is required. Install with: pip install llama-cpp-python")
+        handler_class = getattr(llama_chat_format, self.config["chat_handler"], None)
+        if handler_class is None:
+            raise ValueError(f"llama-cpp-python has no chat handler {self.config['chat_handler']}; upgrade it or "
+                             f"change GGUF_MODELS['{self.model_name}']")
+
+        llama_kwargs = {"n_ctx": self.n_ctx, "n_batch": self.n_batch, "n_threads": self.threads,
+                        "n_threads_batch": self.threads, "verbose": False}
+        if self.config.get("mmproj_path"):
+            chat_handler = handler_class(clip_model_path=self.config["mmproj_path"], verbose=False)
+        else:
+            chat_handler = handler_class.from_pretrained(repo_id=self.config["repo_id"],
+                                                         filename=self.config["mmproj"], verbose=False)
+        if self.config.get("model_path"):
+            self.model = llama_cpp.Llama(model_path=self.config["model_path"], chat_handler=chat_handler, **llama_kwargs)
+        else:
+            self.model = llama_cpp.Llama.from_pretrained(repo_id=self.config["repo_id"], filename=self.config["filename"],
+                                                         chat_handler=chat_handler, **llama_kwargs)
+
+    def _image_content(self, images: List[str]) -> List[Dict]:
+        # The chat handler loads data URIs and http URLs; local files and shard entries are inlined
+        content = []
+        for img in images:
+            img_path = load_image(img)
+            if not img_path.startswith('http'):
+                encoded = base64.b64encode(read_image_bytes(img_path)).decode('utf-8')
+                img_path = f"data:{image_mime_type(img_path)};base64,{encoded}"
+            content.append({"type": "image_url", "image_url": {"url": img_path}})
+        return content
+
+    def generate(
+        self,
+        messages: List[Dict],
+        images: Optional[List[str]] = None,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> Dict:
+        if self.model is None:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+
+        # Images go with the first user message, ahead of its text with cache_layout
+        cache_layout = kwargs.get("cache_layout", False)
+        with profile_section("image_loading"):
+            image_content = self._image_content(images) if images else []
+        formatted = []
+        for msg in messages:
+            role, content = msg.get("role", "user"), msg.get("content", "")
+            if image_content and role == "user":
+                text_content = [{"type": "text", "text": content}]
+                content = image_content + text_content if cache_layout else text_content + image_content
+                image_content = []
+            formatted.append({"role": role, "content": content})
+
+        valid_params = {
+            "max_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": kwargs.get("top_p"),
+            "top_k": kwargs.get("top_k"),
+            "repeat_penalty": kwargs.get("repetition_penalty"),
+        }
+        sampling = {k: v for k, v in valid_params.items() if v is not None}
+        if kwargs.get("timeout"):
+            # Per-call deadline, as max_time on the HF path: decoding stops (with a partial
+            # response) once it is reached; it covers every sample of the call
+            deadline = time.monotonic() + kwargs["timeout"]
+            sampling["stopping_criteria"] = llama_cpp.StoppingCriteriaList(
+                [lambda input_ids, logits: time.monotonic() >= deadline])
+
+        completion = self.model.create_chat_completion(messages=formatted, **sampling)
+        prompt_tokens = completion["usage"]["prompt_tokens"]
+        responses = [completion["choices"][0]["message"]["content"]]
+        completion_tokens = completion["usage"]["completion_tokens"]
+
+        # Further samples restart from the evaluated prompt (image positions included): the
+        # longest-prefix match in llama.cpp keeps its KV cache, so only new tokens are decoded
+        prompt_ids = self.model.input_ids[:prompt_tokens].tolist()
+        for _ in range(kwargs.get("num_samples", 1) - 1):
+            sample = self.model.create_completion(prompt=prompt_ids, **sampling)
+            responses.append(sample["choices"][0]["text"])
+            completion_tokens += sample["usage"]["completion_tokens"]
+
+        return {
+            "response": responses[0],
+            "responses": responses,
+            "model": self.model_name,
+            "tokens_used": prompt_tokens + completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+    def cleanup(self):
+        # Frees the llama.cpp context, weights mapping and projector
+        if self.model is not None:
+            close = getattr(self.model, "close", None)
+            if close is not None:
+                close()
+        self.model = None
+
+
+def create_gguf_inference(model_name: str) -> GGUFInference:
+    inference = GGUFInference(model_name)
+    inference.load_model()
+    return inference
@@ -0,0 +1,69 @@
+import atexit
+import threading
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from config import HTTP_POOL
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_settings: Dict = dict(HTTP_POOL)
+# Called when configure_http_pool replaces the pool, so wrappers built on the old one are dropped
+_reset_callbacks: List[Callable[[], None]] = []
+
+
+def _build_client(settings: Dict) -> httpx.Client:
+    limits = httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"])
+    try:
+        return httpx.Client(http2=settings["http2"], limits=limits, timeout=timeout)
+    except ImportError:
+        # http2=True without the h2 package
+        return httpx.Client(http2=False, limits=limits, timeout=timeout)
+
+
+def get_http_client() -> httpx.Client:
+    # One pooled client per process: TLS sessions and keep-alive connections are reused
+    # by every backend instance instead of being rebuilt per client
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _build_client(_settings)
+        return _client
+
+
+def on_pool_reset(callback: Callable[[], None]):
+    _reset_callbacks.append(callback)
+
+
+def configure_http_pool(**overrides) -> Dict:
+    # Tune the pool (keys as in config.HTTP_POOL). The old pool's connections are closed and
+    # clients built on it dropped; backends pick up the new pool on their next request.
+    # Meant to be called between runs, not while requests are in flight.
+    global _client
+    unknown = set(overrides) - set(HTTP_POOL)
+    if unknown:
+        raise ValueError(f"Unknown HTTP pool setting(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _settings.update(overrides)
+        old_client, _client = _client, None
+        settings = dict(_settings)
+    for callback in _reset_callbacks:
+        callback()
+    if old_client is not None:
+        old_client.close()
+    return settings
+
+
+@atexit.register
+def close_http_pool():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
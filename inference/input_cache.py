@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+
+from .base_inference import image_digest
+
+try:
+    from safetensors import safe_open
+    from safetensors.torch import save_file
+except ImportError:
+    safe_open = None
+    save_file = None
+
+
+def _strip_images(messages: List[Dict]) -> List[Dict]:
+    # Image parts may hold paths or PIL objects; images are keyed by content hash instead
+    stripped = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list):
+            content = [{"type": "image"} if part.get("type") == "image" else part for part in content]
+        stripped.append({"role": msg.get("role"), "content": content})
+    return stripped
+
+
+class ProcessedInputCache:
+    # Disk-backed cache of processor outputs (input_ids, attention_mask, pixel_values,
+    # aspect-ratio tensors, ...) stored as safetensors and read back memory-mapped
+
+    def __init__(self, cache_dir: str, namespace: str, max_memory_entries: int = 64):
+        if safe_open is None:
+            raise ImportError("safetensors package is required. Install with: pip install safetensors")
+        # One subdirectory per processor fingerprint so processor upgrades never reuse stale tensors
+        namespace_hash = hashlib.sha256(namespace.encode('utf-8')).hexdigest()[:16]
+        self.cache_dir = Path(cache_dir) / namespace_hash
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Dict[str, torch.Tensor]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, messages: List[Dict], images: List[str]) -> str:
+        payload = {
+            "messages": _strip_images(messages),
+            "images": [image_digest(img) for img in images],
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.safetensors"
+
+    def get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+        path = self._path(key)
+        if not path.exists():
+            self.misses += 1
+            return None
+
+        tensors = {}
+        with safe_open(str(path), framework="pt", device="cpu") as f:
+            for name in f.keys():
+                tensors[name] = f.get_tensor(name)
+        self._remember(key, tensors)
+        self.hits += 1
+        return tensors
+
+    def put(self, key: str, inputs) -> bool:
+        # Only plain tensor dicts can be stored; anything else is left uncached
+        tensors = {}
+        for name, value in inputs.items():
+            if not isinstance(value, torch.Tensor):
+                return False
+            tensors[name] = value.detach().to("cpu").contiguous()
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        save_file(tensors, str(tmp_path), metadata={"namespace": self.namespace})
+        os.replace(tmp_path, path)
+        self._remember(key, tensors)
+        return True
+
+    def _remember(self, key: str, tensors: Dict[str, torch.Tensor]):
+        self._memory[key] = tensors
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
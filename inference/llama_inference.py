@@ -1,9 +1,16 @@
+import json
 import torch
-from transformers import AutoProcessor, AutoModelForVision2Seq
+import transformers
+from transformers import AutoProcessor, AutoModelForVision2Seq, BatchFeature
 from pathlib import Path
 from typing import Dict, List, Optional
-from .base_inference import BaseInference, load_image
-from config import HUGGINGFACE_TOKEN
+from .base_inference import BaseInference, load_image, open_image, image_digest
+from data.image_shards import is_shard_ref
+from .input_cache import ProcessedInputCache
+from .vision_cache import VisionEncoderCache, find_vision_tower
+from harness.profiling import profile_section, torch_profile
+from config import (HUGGINGFACE_TOKEN, INPUT_CACHE_DIR, USE_INPUT_CACHE, USE_VISION_CACHE,
+                    VISION_CACHE_DIR, VISION_CACHE_MAX_MEMORY_BYTES)
 
 class LlamaInference(BaseInference):   
     MODEL_CONFIGS = {
@@ -17,9 +24,17 @@ class LlamaInference(BaseInference):
         }
     }
     
-    def __init__(self, model_name: str, device_map: str = "auto"):
+    def __init__(self, model_name: str, device_map: str = "auto", input_cache_dir: Optional[str] = None,
+                 model_path: Optional[str] = None, vision_cache: bool = False):
         super().__init__(model_name)
         self.device_map = device_map
+        self.use_vision_cache = vision_cache
+        self.vision_cache = None
+        # Local copy to load instead of the hub checkpoint (disk tier of inference/residency.py)
+        self.model_path = model_path
+        self._device = None
+        self.input_cache_dir = input_cache_dir
+        self.input_cache = None
         self.model = None
         self.processor = None
         self._validate_model()
@@ -34,21 +49,83 @@ class LlamaInference(BaseInference):
         token = HUGGINGFACE_TOKEN
         token_kwargs = {"token": token} if token else {}
         
+        source = self.model_path or self.model_name
         self.processor = AutoProcessor.from_pretrained(
-            self.model_name,
+            source,
             **token_kwargs
         )
         
+        self._init_input_cache()
+        
         # Load model based on model_class
         if config["model_class"] == "AutoModelForVision2Seq":
             self.model = AutoModelForVision2Seq.from_pretrained(
-                self.model_name,
+                source,
                 device_map=self.device_map,
                 torch_dtype=torch.bfloat16,
                 **token_kwargs
             )
         else:
             raise ValueError(f"Unsupported model class: {config.get('model_class')}")
+        
+        if self.use_vision_cache:
+            self._attach_vision_cache()
+    
+    def _init_input_cache(self):
+        if self.input_cache_dir:
+            # Processed inputs depend on the processor implementation, so key the cache on it
+            namespace = f"{self.model_name}|{type(self.processor).__name__}|transformers-{transformers.__version__}"
+            self.input_cache = ProcessedInputCache(self.input_cache_dir, namespace)
+    
+    def _attach_vision_cache(self):
+        tower = find_vision_tower(self.model)
+        if tower is None:
+            print(f"[WARN] No vision encoder found on {self.model_name}; vision cache disabled")
+            return
+        # Pixel inputs depend on the image processor settings, so they are part of the key
+        image_processor = getattr(self.processor, "image_processor", None)
+        processor_config = json.dumps(image_processor.to_dict() if image_processor is not None else {},
+                                      sort_keys=True, default=str)
+        namespace = f"{self.model_name}|{type(self.processor).__name__}|{processor_config}|transformers-{transformers.__version__}"
+        self.vision_cache = VisionEncoderCache(namespace, max_memory_bytes=VISION_CACHE_MAX_MEMORY_BYTES,
+                                               disk_dir=VISION_CACHE_DIR)
+        self.vision_cache.attach(tower)
+    
+    def device_bytes(self) -> int:
+        # Bytes of weights and buffers currently on an accelerator
+        if self.model is None:
+            return 0
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors if t.device.type != "cpu")
+    
+    def to_host(self) -> bool:
+        # Park the weights in CPU RAM; models dispatched over several devices (accelerate hooks)
+        # or already offloaded cannot be moved as a whole and return False
+        device_map = getattr(self.model, "hf_device_map", None) or {}
+        placements = set(device_map.values())
+        if len(placements) > 1 or placements & {"cpu", "disk"}:
+            return False
+        self._device = self.model.device
+        self.model.to("cpu")
+        return True
+    
+    def to_device(self):
+        if self._device is not None:
+            self.model.to(self._device)
+            self._device = None
+    
+    def save_weights(self, path: str):
+        # bf16 safetensors copy that from_pretrained memory-maps when loaded via model_path
+        self.model.save_pretrained(path, safe_serialization=True)
+        self.processor.save_pretrained(path)
+    
+    def cleanup(self):
+        # Drop every reference to the weights; the caller collects and empties the CUDA cache
+        self.model = None
+        self.processor = None
+        self.input_cache = None
+        self.vision_cache = None
+        self._device = None
     
     def generate(
         self,
@@ -70,14 +147,9 @@ class LlamaInference(BaseInference):
         # Format messages for processing
         formatted_messages = self._format_messages(messages, processed_images)
         
-        # Apply chat template
-        inputs = self.processor.apply_chat_template(
-            formatted_messages,
-            add_generation_prompt=True,
-            tokenize=True,
-            return_dict=True,
-            return_tensors="pt"
-        ).to(self.model.device)
+        # Apply chat template (or reuse cached processor outputs)
+        with profile_section("image_loading"):
+            inputs, cache_hit = self._prepare_inputs(formatted_messages, processed_images)
         
         # Filter valid generation parameters
         valid_params = {
@@ -88,21 +160,62 @@ class LlamaInference(BaseInference):
             "do_sample": kwargs.get("do_sample", True if temperature > 0 else False),
             "repetition_penalty": kwargs.get("repetition_penalty"),
             "num_beams": kwargs.get("num_beams"),
+            # Per-call deadline: generation stops (with a partial response) once it is reached
+            "max_time": kwargs.get("timeout"),
         }
+        # Several samples share one prefill: generate expands the prompt cache per sequence
+        num_samples = kwargs.get("num_samples", 1)
+        if num_samples > 1:
+            valid_params["num_return_sequences"] = num_samples
         generate_kwargs = {k: v for k, v in valid_params.items() if v is not None}
         
-        outputs = self.model.generate(**inputs, **generate_kwargs)
+        vision_hits = self.vision_cache.hits if self.vision_cache is not None else 0
+        with torch_profile("generate"):
+            if self.vision_cache is not None and processed_images:
+                with self.vision_cache.images([image_digest(img) for img in processed_images]):
+                    outputs = self.model.generate(**inputs, **generate_kwargs)
+            else:
+                outputs = self.model.generate(**inputs, **generate_kwargs)
         
-        response = self.processor.batch_decode(
-            outputs[:, inputs["input_ids"].shape[-1]:]
-        )[0]
+        generated = outputs[:, inputs["input_ids"].shape[-1]:]
+        responses = self.processor.batch_decode(generated)
+        
+        # Shorter samples are right-padded; only count real tokens
+        pad_token_id = getattr(self.processor.tokenizer, "pad_token_id", None)
+        if pad_token_id is not None:
+            tokens_generated = int((generated != pad_token_id).sum())
+        else:
+            tokens_generated = generated.numel()
         
         return {
-            "response": response,
+            "response": responses[0],
+            "responses": responses,
             "model": self.model_name,
-            "tokens_generated": len(outputs[0]) - inputs["input_ids"].shape[-1]
+            "tokens_generated": tokens_generated,
+            "input_cache_hit": cache_hit,
+            "vision_cache_hit": self.vision_cache is not None and self.vision_cache.hits > vision_hits
         }
     
+    def _prepare_inputs(self, formatted_messages: List[Dict], images: List[str]):
+        cache_key = None
+        if self.input_cache is not None:
+            cache_key = self.input_cache.key(formatted_messages, images)
+            cached = self.input_cache.get(cache_key)
+            if cached is not None:
+                return BatchFeature(data=cached).to(self.model.device), True
+        
+        # Shard images are only decoded on a miss; the key is built from their content digests
+        inputs = self.processor.apply_chat_template(
+            self._decode_shard_images(formatted_messages),
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt"
+        )
+        if cache_key is not None:
+            self.input_cache.put(cache_key, inputs)
+        return inputs.to(self.model.device), False
+    
     def _format_messages(self, messages: List[Dict], images: List[str]) -> List[Dict]:
         formatted = []
         
@@ -127,9 +240,27 @@ class LlamaInference(BaseInference):
                     )
         
         return formatted
+    
+    def _decode_shard_images(self, formatted_messages: List[Dict]) -> List[Dict]:
+        # Paths/URLs are loaded by the processor; shard references have to be handed over as PIL images
+        decoded = []
+        for msg in formatted_messages:
+            content = msg.get("content")
+            if isinstance(content, list):
+                content = [
+                    {"type": "image", "image": open_image(part["url"])}
+                    if part.get("type") == "image" and is_shard_ref(part.get("url", "")) else part
+                    for part in content
+                ]
+            decoded.append({**msg, "content": content})
+        return decoded
 
 
-def create_llama_inference(model_name: str) -> LlamaInference:
-    inference = LlamaInference(model_name)
+def create_llama_inference(model_name: str, input_cache_dir: Optional[str] = None,
+                           model_path: Optional[str] = None, vision_cache: bool = USE_VISION_CACHE) -> LlamaInference:
+    if input_cache_dir is None and USE_INPUT_CACHE:
+        input_cache_dir = str(INPUT_CACHE_DIR)
+    inference = LlamaInference(model_name, input_cache_dir=input_cache_dir, model_path=model_path,
+                               vision_cache=vision_cache)
     inference.load_model()
     return inference
@@ -0,0 +1,61 @@
+import hashlib
+import json
+from typing import Callable, Dict, List, Optional
+
+from .base_inference import BaseInference, image_digest, load_image
+from .uploads import get_upload_cache
+
+
+class MockInference(BaseInference):
+    # Offline backend with the same generate contract; responses are deterministic in the
+    # request (messages + image content), so runs are reproducible without API keys or GPUs
+
+    def __init__(self, model_name: str = "mock", responder: Optional[Callable[[List[Dict], str], str]] = None):
+        super().__init__(model_name)
+        self.responder = responder
+        self.calls = 0
+
+    def load_model(self):
+        pass
+
+    def generate(self, messages: List[Dict], images: Optional[List[str]] = None,
+                 max_new_tokens: int = 512, temperature: float = 0.7, **kwargs) -> Dict:
+        self.calls += 1
+        # With uploads enabled (normally against the local stub), images go through the same
+        # upload-once path as the API backends; the reference carries the content digest
+        uploads = get_upload_cache("mock")
+        if uploads is not None:
+            image_ids = [uploads.reference(img)["digest"] for img in images or []]
+        else:
+            image_ids = [image_digest(load_image(img)) for img in images or []]
+        payload = json.dumps({
+            "messages": messages,
+            "images": image_ids,
+        }, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+        num_samples = kwargs.get("num_samples", 1)
+        responses = []
+        for i in range(num_samples):
+            if self.responder is not None:
+                responses.append(self.responder(messages, f"{digest}:{i}"))
+            else:
+                responses.append(f"[{self.model_name}] mock response {digest[:12]}-{i}")
+
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        completion_tokens = sum(len(r.split()) for r in responses)
+        return {
+            "response": responses[0],
+            "responses": responses,
+            "model": self.model_name,
+            "tokens_used": prompt_tokens + completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+
+def create_mock_inference(model_name: str = "mock",
+                          responder: Optional[Callable[[List[Dict], str], str]] = None) -> MockInference:
+    inference = MockInference(model_name, responder)
+    inference.load_model()
+    return inference
@@ -1,30 +1,71 @@
 import os
 import base64
+import threading
 from typing import Dict, List, Optional
-from openai import OpenAI
+from openai import OpenAI, BadRequestError, NotFoundError
 from pathlib import Path
-from .base_inference import BaseInference, load_image
+from .base_inference import BaseInference, load_image, read_image_bytes, image_mime_type
+from .http_pool import get_http_client, on_pool_reset
+from .uploads import get_upload_cache, is_stale_reference_error
+from harness.profiling import profile_section
 import dotenv
 dotenv.load_dotenv()
+
+_clients: Dict = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: Optional[str], base_url: Optional[str] = None) -> OpenAI:
+    # One client per (API key, endpoint) on top of the process-wide connection pool
+    http_client = get_http_client()
+    key = (api_key, base_url, id(http_client))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        return _clients[key]
+
+
+def _drop_clients():
+    # The pool they were built on was replaced and closed
+    with _clients_lock:
+        _clients.clear()
+
+
+on_pool_reset(_drop_clients)
+
 class OpenAInference(BaseInference):
     SUPPORTED_MODELS = [
         "gpt-4o",
         "gpt-5",
         "o1",
     ]
-    def __init__(self, model_name: str, api_key: Optional[str] = None):
+    # Provider whose file API holds uploaded images (--upload-images); None always inlines them
+    upload_provider: Optional[str] = "openai"
+    # Send max_new_tokens as max_tokens (serving engines otherwise generate up to their context limit)
+    send_max_tokens = False
+    
+    def __init__(self, model_name: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
         super().__init__(model_name)
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        
-        self.client = OpenAI(api_key=self.api_key)
+        self.base_url = base_url
+        # Model id sent to the API; results keep model_name
+        self.served_model = model_name
+    
+    @property
+    def client(self) -> OpenAI:
+        # Looked up per request so a reconfigured HTTP pool is picked up by existing backends
+        return get_openai_client(self.api_key, base_url=self.base_url)
     
     
     def load_model(self):
         pass
     
+    def _client_for(self, timeout: Optional[float]):
+        # The harness's per-call deadline as the request timeout, so abandoned calls end too
+        return self.client.with_options(timeout=timeout) if timeout else self.client
+    
     def _encode_image(self, image_path: str) -> str:
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode('utf-8')
+        return base64.b64encode(read_image_bytes(image_path)).decode('utf-8')
     
     def _prepare_image_content(self, images: List[str]) -> List[Dict]:
         """Prepare image content for API."""
@@ -40,12 +81,12 @@ class OpenAInference(BaseInference):
                     "image_url": {"url": img_path}
                 })
             else:
-                # Local file, encode to base64
+                # Local file or shard entry, encode to base64
                 encoded_image = self._encode_image(img_path)
                 image_content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{encoded_image}"
+                        "url": f"data:{image_mime_type(img_path)};base64,{encoded_image}"
                     }
                 })
         
@@ -59,15 +100,26 @@ class OpenAInference(BaseInference):
         temperature: float = 1,
         **kwargs
     ) -> Dict:
+        # Uploaded images are referenced by file ID, which only the Responses API accepts
+        uploads = get_upload_cache(self.upload_provider) if self.upload_provider else None
+        if uploads is not None and images:
+            return self._generate_with_file_ids(messages, images, uploads, max_new_tokens, temperature, **kwargs)
+        
         formatted_messages = []
+        # Images are attached to the first user message only; with cache_layout they precede its
+        # text so system prompt + image form a prefix shared by every profile (provider prompt cache)
+        cache_layout = kwargs.get("cache_layout", False)
+        with profile_section("image_loading"):
+            image_content = self._prepare_image_content(images) if images else []
         
         for msg in messages:
             role = msg.get("role", "user")
             content = msg.get("content", "")
             
-            if images and role == "user":
-                content_list = [{"type": "text", "text": content}]
-                content_list.extend(self._prepare_image_content(images))
+            if image_content and role == "user":
+                text_content = [{"type": "text", "text": content}]
+                content_list = image_content + text_content if cache_layout else text_content + image_content
+                image_content = []
                 formatted_messages.append({
                     "role": role,
                     "content": content_list
@@ -94,6 +146,13 @@ class OpenAInference(BaseInference):
             "stop": kwargs.get("stop"),
         }
         
+        # Several samples from one request: the prompt and image are sent and prefilled once
+        num_samples = kwargs.get("num_samples", 1)
+        if num_samples > 1:
+            valid_params["n"] = num_samples
+        if self.send_max_tokens:
+            valid_params["max_tokens"] = max_new_tokens
+        
         # # Use appropriate parameter name based on model
         # if requires_max_completion_tokens:
         #     valid_params["max_completion_tokens"] = max_new_tokens
@@ -102,18 +161,82 @@ class OpenAInference(BaseInference):
                 
         valid_params = {k: v for k, v in valid_params.items() if v is not None}
         
-        response = self.client.chat.completions.create(
-            model=self.model_name,
+        response = self._client_for(kwargs.get("timeout")).chat.completions.create(
+            model=self.served_model,
             messages=formatted_messages,
             **valid_params
         )
         
+        responses = [choice.message.content for choice in response.choices]
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        
         return {
-            "response": response.choices[0].message.content,
+            "response": responses[0],
+            "responses": responses,
             "model": self.model_name,
             "tokens_used": response.usage.total_tokens,
             "prompt_tokens": response.usage.prompt_tokens,
-            "completion_tokens": response.usage.completion_tokens
+            "completion_tokens": response.usage.completion_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0
+        }
+
+    
+    def _generate_with_file_ids(self, messages: List[Dict], images: List[str], uploads,
+                                max_new_tokens: int, temperature: float, **kwargs) -> Dict:
+        try:
+            return self._send_with_file_ids(messages, images, uploads, max_new_tokens, temperature, **kwargs)
+        except (NotFoundError, BadRequestError) as e:
+            if not is_stale_reference_error(e):
+                raise
+            # A file was deleted or expired provider-side: upload the images again and retry once
+            for img in images:
+                uploads.invalidate(img)
+            return self._send_with_file_ids(messages, images, uploads, max_new_tokens, temperature, **kwargs)
+    
+    def _send_with_file_ids(self, messages: List[Dict], images: List[str], uploads,
+                            max_new_tokens: int, temperature: float, **kwargs) -> Dict:
+        image_parts = []
+        for img in images:
+            img_path = load_image(img)
+            if img_path.startswith('http'):
+                image_parts.append({"type": "input_image", "image_url": img_path})
+            else:
+                image_parts.append({"type": "input_image", "file_id": uploads.reference(img_path)["file_id"]})
+        
+        cache_layout = kwargs.get("cache_layout", False)
+        input_items = []
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            if image_parts and role == "user":
+                text_parts = [{"type": "input_text", "text": content}]
+                input_items.append({"role": role, "content": image_parts + text_parts if cache_layout else text_parts + image_parts})
+                image_parts = []
+            else:
+                input_items.append({"role": role, "content": content})
+        
+        valid_params = {"temperature": temperature, "top_p": kwargs.get("top_p"), "max_output_tokens": max_new_tokens}
+        valid_params = {k: v for k, v in valid_params.items() if v is not None}
+        
+        # The Responses API has no n: one request per sample, with usage summed so the ledger
+        # charges all of them (repeats of the prefix are served from the prompt cache)
+        responses = []
+        usage = {"tokens_used": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        client = self._client_for(kwargs.get("timeout"))
+        for _ in range(kwargs.get("num_samples", 1)):
+            response = client.responses.create(model=self.served_model, input=input_items, **valid_params)
+            details = getattr(response.usage, "input_tokens_details", None)
+            responses.append(response.output_text)
+            usage["tokens_used"] += response.usage.total_tokens
+            usage["prompt_tokens"] += response.usage.input_tokens
+            usage["completion_tokens"] += response.usage.output_tokens
+            usage["cached_tokens"] += getattr(details, "cached_tokens", None) or 0
+        
+        return {
+            "response": responses[0],
+            "responses": responses,
+            "model": self.model_name,
+            **usage
         }
 
 
@@ -0,0 +1,102 @@
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+from transformers import AutoProcessor
+
+from .base_inference import cpu_threads
+from .llama_inference import LlamaInference
+from config import HUGGINGFACE_TOKEN, INPUT_CACHE_DIR, USE_INPUT_CACHE, OPENVINO, OPENVINO_MODELS
+
+# Written into an export directory once the converted model and processor are fully saved
+EXPORT_MARKER = ".exported"
+
+
+def openvino_config(threads: Optional[int] = None, performance_hint: str = "LATENCY",
+                    cache_dir: Optional[str] = None) -> Dict[str, str]:
+    # Runtime properties for the compiled model. LATENCY with one stream gives every thread to
+    # the single in-flight generate call, which is how the harness drives local models.
+    config = {
+        "PERFORMANCE_HINT": performance_hint,
+        "INFERENCE_NUM_THREADS": str(threads or cpu_threads()),
+    }
+    if performance_hint == "LATENCY":
+        config["NUM_STREAMS"] = "1"
+    if cache_dir:
+        # Compiled blobs, so later runs skip graph compilation
+        config["CACHE_DIR"] = str(cache_dir)
+    return config
+
+
+class OpenVINOInference(LlamaInference):
+    # The LlamaInference models exported to OpenVINO IR with INT8 weight-only compression and run
+    # on CPU through optimum-intel. Same generate contract and message formatting as the HF path;
+    # the export is done once and reused from OPENVINO["export_dir"].
+
+    def __init__(self, model_name: str, input_cache_dir: Optional[str] = None, model_path: Optional[str] = None,
+                 weight_bits: int = OPENVINO["weight_bits"], threads: Optional[int] = OPENVINO["threads"],
+                 performance_hint: str = OPENVINO["performance_hint"]):
+        if model_name not in OPENVINO_MODELS and model_path is None:
+            raise ValueError(f"No OpenVINO export for {model_name}. Available: {', '.join(OPENVINO_MODELS)}")
+        # The compiled model is not a torch module, so there is no vision tower to cache
+        super().__init__(model_name, device_map="cpu", input_cache_dir=input_cache_dir, model_path=model_path)
+        self.weight_bits = weight_bits
+        self.threads = threads or cpu_threads()
+        self.performance_hint = performance_hint
+
+    def export_path(self) -> Path:
+        return Path(OPENVINO["export_dir"]) / self.model_name.replace('/', '_') / f"int{self.weight_bits}"
+
+    def load_model(self):
+        try:
+            from optimum.intel import OVModelForVisualCausalLM, OVWeightQuantizationConfig
+        except ImportError:
+            raise ImportError("optimum-intel package is required. Install with: pip install \"optimum[openvino]\"")
+
+        # Tokenization and image preprocessing stay in torch; keep them on the same CPUs
+        torch.set_num_threads(self.threads)
+        token_kwargs = {"token": HUGGINGFACE_TOKEN} if HUGGINGFACE_TOKEN else {}
+        export_path = Path(self.model_path) if self.model_path else self.export_path()
+        ov_config = openvino_config(self.threads, self.performance_hint, cache_dir=export_path / "compiled")
+
+        if (export_path / EXPORT_MARKER).exists() or self.model_path:
+            self.processor = AutoProcessor.from_pretrained(str(export_path))
+            self.model = OVModelForVisualCausalLM.from_pretrained(str(export_path), ov_config=ov_config)
+        else:
+            print(f"Exporting {self.model_name} to OpenVINO (INT{self.weight_bits} weights); this runs once")
+            self.processor = AutoProcessor.from_pretrained(self.model_name, **token_kwargs)
+            self.model = OVModelForVisualCausalLM.from_pretrained(
+                self.model_name,
+                export=True,
+                quantization_config=OVWeightQuantizationConfig(bits=self.weight_bits),
+                ov_config=ov_config,
+                **token_kwargs
+            )
+            # OpenVINO IR (xml + bin) with the compressed weights; the bin files are memory-mapped on load
+            self.model.save_pretrained(str(export_path))
+            self.processor.save_pretrained(str(export_path))
+            (export_path / EXPORT_MARKER).write_text(self.model_name, encoding='utf-8')
+
+        # Same processor as the HF path, so processed inputs are shared with it
+        self._init_input_cache()
+
+    def device_bytes(self) -> int:
+        return 0
+
+    def weights_path(self) -> str:
+        # The export already is a memory-mappable copy; the residency disk tier points at it
+        # instead of writing another one
+        return str(Path(self.model_path) if self.model_path else self.export_path())
+
+    def to_host(self) -> bool:
+        # Already in host memory; the residency manager unloads it instead
+        return False
+
+
+def create_openvino_inference(model_name: str, input_cache_dir: Optional[str] = None,
+                              model_path: Optional[str] = None) -> OpenVINOInference:
+    if input_cache_dir is None and USE_INPUT_CACHE:
+        input_cache_dir = str(INPUT_CACHE_DIR)
+    inference = OpenVINOInference(model_name, input_cache_dir=input_cache_dir, model_path=model_path)
+    inference.load_model()
+    return inference
@@ -0,0 +1,102 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+from .base_inference import BaseInference
+
+
+def _create_llama(model_name: str, **kwargs) -> BaseInference:
+    from .llama_inference import create_llama_inference
+    return create_llama_inference(model_name, **kwargs)
+
+
+def _create_openvino(model_name: str, **kwargs) -> BaseInference:
+    from .openvino_inference import create_openvino_inference
+    return create_openvino_inference(model_name, **kwargs)
+
+
+def _create_gguf(model_name: str, **kwargs) -> BaseInference:
+    from .gguf_inference import create_gguf_inference
+    return create_gguf_inference(model_name, **kwargs)
+
+
+def _create_endpoint(model_name: str, **kwargs) -> BaseInference:
+    from .endpoint_inference import create_endpoint_inference
+    return create_endpoint_inference(model_name, **kwargs)
+
+
+def _create_openai(model_name: str, **kwargs) -> BaseInference:
+    from .openai_inference import create_openai_inference
+    return create_openai_inference(model_name, **kwargs)
+
+
+def _create_gemini(model_name: str, **kwargs) -> BaseInference:
+    from .gemini_inference import create_gemini_inference
+    return create_gemini_inference(model_name, **kwargs)
+
+
+def _create_mock(model_name: str, **kwargs) -> BaseInference:
+    from .mock_inference import create_mock_inference
+    return create_mock_inference(model_name, **kwargs)
+
+
+# Backend type -> factory; imports are deferred so API-only runs never import torch
+INFERENCE_FACTORIES: Dict[str, Callable[..., BaseInference]] = {
+    "llama": _create_llama,
+    "openvino": _create_openvino,
+    "gguf": _create_gguf,
+    "endpoint": _create_endpoint,
+    "openai": _create_openai,
+    "gemini": _create_gemini,
+    "mock": _create_mock,
+}
+
+
+def create_inference(model_type: str, model_name: str, **kwargs) -> BaseInference:
+    factory = INFERENCE_FACTORIES.get(model_type)
+    if factory is None:
+        raise ValueError(f"Unknown model type: {model_type}")
+    return factory(model_name, **kwargs)
+
+
+# Backends that serve the local checkpoints (the MODEL_CONFIGS of LlamaInference): in this
+# process, or through an OpenAI-compatible serving engine (endpoint)
+LOCAL_BACKENDS = ("llama", "openvino", "gguf", "endpoint")
+
+def supports_model(model_type: str, model_name: str) -> bool:
+    # Some local backends only have builds of part of the local models (config.GGUF_MODELS,
+    # config.OPENVINO_MODELS)
+    if model_type == "gguf":
+        from config import GGUF_MODELS
+        return model_name in GGUF_MODELS
+    if model_type == "openvino":
+        from config import OPENVINO_MODELS
+        return model_name in OPENVINO_MODELS
+    return True
+
+
+# API backends only hold a client, so one instance per model can serve every evaluation
+SHARED_BACKENDS = {"openai", "gemini", "mock", "endpoint"}
+_shared: Dict[Tuple[str, str], BaseInference] = {}
+_shared_lock = threading.Lock()
+
+
+def get_inference(model_type: str, model_name: str) -> BaseInference:
+    # Reuses the instance (and its pooled connections) for API backends; local models go
+    # through the residency manager, which loads, parks and unloads their weights
+    if model_type not in SHARED_BACKENDS:
+        from .residency import get_residency
+        return get_residency().acquire(model_type, model_name)
+    key = (model_type, model_name)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = create_inference(model_type, model_name)
+        return _shared[key]
+
+
+def release_inference():
+    # End of run: unload local models and let shared backends release provider-side state
+    from .residency import release_models
+    release_models()
+    with _shared_lock:
+        for inference in _shared.values():
+            inference.cleanup()
@@ -0,0 +1,262 @@
+import gc
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import MODEL_RESIDENCY
+
+# Residency tiers, fastest to restore first
+TIERS = ("device", "host", "disk")
+# Written last into a disk-tier copy, so a partially saved copy is never loaded
+COMPLETE_MARKER = ".complete"
+# Warn when an unload frees less than this fraction of the accelerator bytes the model held
+MIN_FREED_FRACTION = 0.9
+
+
+def _torch():
+    # torch only if a local backend already imported it, so API-only runs never pay for the import
+    return sys.modules.get("torch")
+
+
+def device_memory_bytes() -> Optional[int]:
+    # Bytes held by live tensors across CUDA devices, or None without CUDA
+    torch = _torch()
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return sum(torch.cuda.memory_allocated(i) for i in range(torch.cuda.device_count()))
+
+
+def host_rss_bytes() -> Optional[int]:
+    # Resident set size of this process (Linux), or None where /proc is unavailable
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory():
+    # Collect unreachable objects (reference cycles keep whole models alive), then return
+    # the CUDA caching allocator's free blocks to the driver
+    gc.collect()
+    torch = _torch()
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.synchronize()
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+
+
+class ModelResidency:
+    # Decides which local models hold memory. At most max_device models stay on the accelerator;
+    # the least recently used one is pushed out to host RAM (up to max_host models), then to a
+    # safetensors copy under disk_dir (memory-mapped when loaded back, up to max_disk copies),
+    # and otherwise unloaded. Switching back to a parked model moves or maps its weights
+    # instead of reloading the original checkpoint.
+    #
+    # Backends that support the tiers implement to_host(), to_device(), device_bytes() and
+    # save_weights(path), and accept model_path= in their factory; others skip those tiers.
+    # Backends that already keep a loadable copy on disk expose weights_path() instead, which
+    # the disk tier references (and never deletes) rather than duplicating.
+    # Every backend implements cleanup(), which drops its weights. Callers should not hold on to an instance across
+    # acquire() calls for other models, or its memory cannot be freed.
+
+    def __init__(self, factory: Callable, max_device: int = 1, max_host: int = 0,
+                 disk_dir: Optional[str] = None, max_disk: int = 2):
+        if max_device < 1:
+            raise ValueError("max_device must be at least 1")
+        self.factory = factory
+        self.max_device = max_device
+        self.max_host = max_host
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk = max_disk if self.disk_dir is not None else 0
+        self._lock = threading.RLock()
+        # (model_type, model_name) -> instance for device/host, -> copy directory for disk
+        self._tiers: Dict[str, OrderedDict] = {tier: OrderedDict() for tier in TIERS}
+        # Disk-tier entries owned by the backend (weights_path), not written by this manager
+        self._external = set()
+        self.switches: List[Dict] = []
+        self.unloads: List[Dict] = []
+        if self.disk_dir is not None:
+            self._scan_disk()
+
+    def _scan_disk(self):
+        # Copies written by earlier runs are reused, oldest first in LRU order
+        copies = []
+        for marker in self.disk_dir.glob(f"*/*/{COMPLETE_MARKER}"):
+            model_type = marker.parent.parent.name
+            model_name = (marker.parent / COMPLETE_MARKER).read_text(encoding='utf-8').strip()
+            copies.append((marker.stat().st_mtime, (model_type, model_name), marker.parent))
+        for _, key, path in sorted(copies):
+            self._tiers["disk"][key] = path
+
+    def _disk_path(self, key: Tuple[str, str]) -> Path:
+        model_type, model_name = key
+        return self.disk_dir / model_type / model_name.replace('/', '_')
+
+    def acquire(self, model_type: str, model_name: str):
+        # The model on the accelerator, restored from the fastest tier that holds it
+        key = (model_type, model_name)
+        with self._lock:
+            device = self._tiers["device"]
+            if key in device:
+                device.move_to_end(key)
+                return device[key]
+
+            # Taken out of the lower tiers first so making room on the device cannot evict it
+            parked = self._tiers["host"].pop(key, None)
+            disk_copy = self._tiers["disk"].pop(key, None)
+            while len(device) >= self.max_device:
+                self._evict_device()
+            start = time.perf_counter()
+            if parked is not None:
+                source = "host"
+                inference = parked
+                inference.to_device()
+            elif disk_copy is not None:
+                source = "disk"
+                inference = self.factory(model_type, model_name, model_path=str(disk_copy))
+            else:
+                source = "checkpoint"
+                inference = self.factory(model_type, model_name)
+            seconds = time.perf_counter() - start
+            device[key] = inference
+            if disk_copy is not None:
+                self._tiers["disk"][key] = disk_copy
+                self._trim_disk()
+            self.switches.append({"model": model_name, "source": source, "seconds": round(seconds, 2)})
+            print(f"[residency] {model_name} ready from {source} in {seconds:.1f}s")
+            return inference
+
+    def _evict_device(self):
+        key, inference = self._tiers["device"].popitem(last=False)
+        if self.max_host > 0 and hasattr(inference, "to_host"):
+            before = device_memory_bytes()
+            if inference.to_host():
+                release_memory()
+                after = device_memory_bytes()
+                freed = f", freed {(before - after) / 2**30:.1f} GiB on device" if before is not None else ""
+                print(f"[residency] Parked {key[1]} in host RAM{freed}")
+                self._tiers["host"][key] = inference
+                while len(self._tiers["host"]) > self.max_host:
+                    self._spill(*self._tiers["host"].popitem(last=False))
+                return
+        self._spill(key, inference)
+
+    def _spill(self, key: Tuple[str, str], inference):
+        # Keep a memory-mappable copy on disk (if configured), then drop the weights
+        if self.max_disk > 0 and (hasattr(inference, "weights_path") or hasattr(inference, "save_weights")):
+            self._save_copy(key, inference)
+        self._unload(key, inference)
+
+    def _save_copy(self, key: Tuple[str, str], inference):
+        disk = self._tiers["disk"]
+        path = self._disk_path(key)
+        if key not in disk and hasattr(inference, "weights_path"):
+            disk[key] = Path(inference.weights_path())
+            self._external.add(key)
+        elif key not in disk:
+            if path.exists():
+                shutil.rmtree(path)
+            try:
+                inference.save_weights(str(path))
+            except Exception as e:
+                print(f"[WARN] Could not write a disk copy of {key[1]}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                return
+            (path / COMPLETE_MARKER).write_text(key[1], encoding='utf-8')
+            disk[key] = path
+        disk.move_to_end(key)
+        self._trim_disk()
+
+    def _trim_disk(self):
+        disk = self._tiers["disk"]
+        while len(disk) > self.max_disk:
+            old_key, old_path = disk.popitem(last=False)
+            if old_key in self._external:
+                self._external.discard(old_key)
+                continue
+            shutil.rmtree(old_path, ignore_errors=True)
+            print(f"[residency] Removed disk copy of {old_key[1]}")
+
+    def _unload(self, key: Tuple[str, str], inference):
+        # Drop the weights and check that the memory actually came back
+        expected = inference.device_bytes() if hasattr(inference, "device_bytes") else 0
+        device_before, host_before = device_memory_bytes(), host_rss_bytes()
+        inference.cleanup()
+        release_memory()
+        device_after, host_after = device_memory_bytes(), host_rss_bytes()
+
+        record = {"model": key[1]}
+        if device_before is not None:
+            record["device_freed_bytes"] = device_before - device_after
+        if host_before is not None:
+            record["host_freed_bytes"] = host_before - host_after
+        self.unloads.append(record)
+        if device_before is not None and expected and record["device_freed_bytes"] < MIN_FREED_FRACTION * expected:
+            print(f"[WARN] Unloading {key[1]} freed {record['device_freed_bytes'] / 2**30:.1f} GiB of "
+                  f"{expected / 2**30:.1f} GiB on device; something still references its tensors")
+        elif device_before is not None:
+            print(f"[residency] Unloaded {key[1]}, freed {record['device_freed_bytes'] / 2**30:.1f} GiB on device")
+
+    def release(self, model_type: str, model_name: str):
+        # Unload one model from whichever memory tier holds it (disk copies are kept)
+        key = (model_type, model_name)
+        with self._lock:
+            for tier in ("device", "host"):
+                if key in self._tiers[tier]:
+                    self._unload(key, self._tiers[tier].pop(key))
+
+    def release_all(self):
+        with self._lock:
+            for tier in ("device", "host"):
+                while self._tiers[tier]:
+                    self._unload(*self._tiers[tier].popitem(last=False))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "resident": {tier: [key[1] for key in self._tiers[tier]] for tier in TIERS},
+                "switches": list(self.switches),
+                "unloads": list(self.unloads),
+            }
+
+
+_residency: Optional[ModelResidency] = None
+_settings: Dict = dict(MODEL_RESIDENCY)
+_residency_lock = threading.Lock()
+
+
+def configure_residency(**overrides) -> Dict:
+    # Tune the tiers (keys as in config.MODEL_RESIDENCY); models already resident are unloaded
+    global _residency
+    unknown = set(overrides) - set(MODEL_RESIDENCY)
+    if unknown:
+        raise ValueError(f"Unknown residency setting(s): {', '.join(sorted(unknown))}")
+    with _residency_lock:
+        if _residency is not None:
+            _residency.release_all()
+        _settings.update(overrides)
+        _residency = None
+        return dict(_settings)
+
+
+def get_residency() -> ModelResidency:
+    global _residency
+    with _residency_lock:
+        if _residency is None:
+            from .registry import create_inference
+            _residency = ModelResidency(create_inference, **_settings)
+        return _residency
+
+
+def release_models():
+    # Unload every resident local model (end of run)
+    with _residency_lock:
+        residency = _residency
+    if residency is not None:
+        residency.release_all()
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .base_inference import load_image, read_image_bytes, image_mime_type, image_digest
+
+# Re-upload this long before a provider-side file expires so no request references a dead file
+EXPIRY_MARGIN_SECONDS = 3600
+# Gemini File API objects are deleted after 48 hours
+GEMINI_FILE_TTL_SECONDS = 48 * 3600
+
+# Every provider's cache writes its own section of the same manifest file
+_manifest_lock = threading.Lock()
+
+
+def is_stale_reference_error(error: Exception) -> bool:
+    # A provider rejecting an uploaded file reference (deleted, expired or unknown ID); the
+    # request succeeds once the image is uploaded again. OpenAI errors carry status_code,
+    # google.api_core errors an HTTP code.
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status in (400, 403, 404) and "file" in str(error).lower()
+
+
+class GeminiFileUploader:
+    provider = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        import google.generativeai as genai
+        from .gemini_inference import _configure
+        _configure(api_key or os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+
+    def upload(self, data: bytes, mime_type: str, digest: str) -> Dict:
+        import io
+        uploaded = self._genai.upload_file(io.BytesIO(data), mime_type=mime_type, display_name=digest[:16])
+        expiration = getattr(uploaded, "expiration_time", None)
+        return {
+            "file_id": uploaded.name,
+            "uri": uploaded.uri,
+            "expires_at": expiration.timestamp() if expiration else time.time() + GEMINI_FILE_TTL_SECONDS,
+        }
+
+
+class OpenAIFileUploader:
+    provider = "openai"
+
+    def __init__(self, api_key: Optional[str] = None):
+        from .openai_inference import get_openai_client
+        self._client = get_openai_client(api_key or os.getenv("OPENAI_API_KEY"))
+
+    def upload(self, data: bytes, mime_type: str, digest: str) -> Dict:
+        suffix = "." + mime_type.split("/")[-1]
+        uploaded = self._client.files.create(file=(f"{digest[:16]}{suffix}", data, mime_type), purpose="vision")
+        # Vision files persist until deleted unless the account sets an expiry
+        return {"file_id": uploaded.id, "uri": None, "expires_at": getattr(uploaded, "expires_at", None)}
+
+
+class LocalStubUploader:
+    # Stands in for a provider file API: stores the bytes under root and hands out stub IDs,
+    # so the upload/manifest/expiry flow can be exercised offline (e.g. with the mock backend)
+
+    def __init__(self, root: str, provider: str = "stub", ttl_seconds: Optional[float] = GEMINI_FILE_TTL_SECONDS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.uploads = 0
+
+    def upload(self, data: bytes, mime_type: str, digest: str) -> Dict:
+        path = self.root / f"{digest}.{mime_type.split('/')[-1]}"
+        path.write_bytes(data)
+        self.uploads += 1
+        return {
+            "file_id": f"stub-{digest[:24]}",
+            "uri": path.absolute().as_uri(),
+            "expires_at": time.time() + self.ttl_seconds if self.ttl_seconds else None,
+        }
+
+
+class ImageUploadCache:
+    # Uploads each distinct image (by content digest) once per provider and remembers the
+    # returned reference in a JSON manifest; expired entries are uploaded again on next use
+
+    def __init__(self, uploader, manifest_path: str):
+        self.uploader = uploader
+        self.manifest_path = Path(manifest_path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self.uploads = 0
+        self.reused = 0
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get(uploader.provider, {})
+
+    def _save(self):
+        with _manifest_lock:
+            self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        manifest[self.uploader.provider] = self._entries
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _fresh(entry: Dict) -> bool:
+        expires_at = entry.get("expires_at")
+        return expires_at is None or expires_at - EXPIRY_MARGIN_SECONDS > time.time()
+
+    def reference(self, image_path: str) -> Dict:
+        # {"file_id", "uri", "mime_type", "digest", "expires_at"} for a local file or shard entry
+        image_path = load_image(image_path)
+        digest = image_digest(image_path)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and self._fresh(entry):
+                self.reused += 1
+                return entry
+            mime_type = image_mime_type(image_path)
+            entry = self.uploader.upload(read_image_bytes(image_path), mime_type, digest)
+            entry.update({"mime_type": mime_type, "digest": digest, "uploaded_at": time.time()})
+            self._entries[digest] = entry
+            self.uploads += 1
+            self._save()
+            return entry
+
+    def invalidate(self, image_path: str):
+        # Drop a reference the provider no longer recognizes so the next use uploads again
+        image_path = load_image(image_path)
+        if image_path.startswith('http'):
+            return
+        with self._lock:
+            if self._entries.pop(image_digest(image_path), None) is not None:
+                self._save()
+
+    def stats(self) -> Dict[str, int]:
+        return {"uploads": self.uploads, "reused": self.reused}
+
+
+UPLOADERS = {
+    "gemini": GeminiFileUploader,
+    "openai": OpenAIFileUploader,
+}
+
+_manifest_path: Optional[str] = None
+_stub_dir: Optional[str] = None
+_caches: Dict[str, ImageUploadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def use_image_uploads(manifest_path: Optional[str], stub_dir: Optional[str] = None):
+    # Enable upload-once image references process-wide (None disables). stub_dir is where the
+    # mock backend "uploads" (LocalStubUploader); real providers always use their file APIs.
+    global _manifest_path, _stub_dir
+    with _caches_lock:
+        _manifest_path = str(manifest_path) if manifest_path else None
+        _stub_dir = stub_dir
+        _caches.clear()
+
+
+def get_upload_cache(provider: str) -> Optional[ImageUploadCache]:
+    # The provider's upload cache, or None when uploads are disabled or unsupported for it
+    if _manifest_path is None:
+        return None
+    with _caches_lock:
+        if provider not in _caches:
+            if provider == "mock":
+                # Stub IDs are only ever handed to the mock backend, never to a real API
+                if _stub_dir is None:
+                    return None
+                uploader = LocalStubUploader(Path(_stub_dir) / provider, provider=provider)
+            elif provider in UPLOADERS:
+                uploader = UPLOADERS[provider]()
+            else:
+                return None
+            _caches[provider] = ImageUploadCache(uploader, _manifest_path)
+        return _caches[provider]
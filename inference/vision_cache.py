@@ -0,0 +1,176 @@
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+try:
+    from safetensors import safe_open
+    from safetensors.torch import save_file
+except ImportError:
+    safe_open = None
+    save_file = None
+
+# Attribute names of the vision encoder on supported models (Mllama, Qwen-VL, LLaVA-style),
+# looked up on the model and on its inner .model
+VISION_TOWER_ATTRS = ("vision_model", "visual", "vision_tower")
+
+
+def find_vision_tower(model) -> Optional[torch.nn.Module]:
+    for owner in (model, getattr(model, "model", None)):
+        for attr in VISION_TOWER_ATTRS:
+            tower = getattr(owner, attr, None) if owner is not None else None
+            if isinstance(tower, torch.nn.Module):
+                return tower
+    return None
+
+
+def _pack(obj, tensors: Dict[str, torch.Tensor]):
+    # Nested encoder output (tensor / tuple / list / ModelOutput) -> JSON spec + flat CPU tensors
+    if isinstance(obj, torch.Tensor):
+        name = f"t{len(tensors)}"
+        tensors[name] = obj.detach().to("cpu").contiguous()
+        return {"tensor": name}
+    if obj is None:
+        return {"none": True}
+    if isinstance(obj, (tuple, list)):
+        return {"sequence": [_pack(item, tensors) for item in obj], "tuple": isinstance(obj, tuple)}
+    if isinstance(obj, dict):
+        # transformers ModelOutput is an OrderedDict subclass; rebuilt as its own class
+        return {"output": f"{type(obj).__module__}:{type(obj).__qualname__}",
+                "fields": {name: _pack(value, tensors) for name, value in obj.items()}}
+    raise TypeError(f"Cannot cache vision encoder output of type {type(obj).__name__}")
+
+
+def _unpack(spec: Dict, tensors: Dict[str, torch.Tensor], device):
+    if "tensor" in spec:
+        return tensors[spec["tensor"]].to(device, non_blocking=True)
+    if "none" in spec:
+        return None
+    if "sequence" in spec:
+        items = [_unpack(item, tensors, device) for item in spec["sequence"]]
+        return tuple(items) if spec["tuple"] else items
+    module_name, _, class_name = spec["output"].partition(":")
+    output_class = getattr(importlib.import_module(module_name), class_name)
+    return output_class(**{name: _unpack(value, tensors, device) for name, value in spec["fields"].items()})
+
+
+class VisionEncoderCache:
+    # Outputs of a model's vision tower (Mllama vision states before the cross-attention
+    # projector, Qwen-VL visual tokens and deepstack features), keyed by model, processor
+    # config, image content hashes and the encoder's input shapes. Every profile and group for
+    # a question sends the same image, so the tower runs once per image per model. Entries live
+    # in host RAM up to max_memory_bytes; with disk_dir, evicted entries are spilled to
+    # safetensors and read back memory-mapped.
+
+    def __init__(self, namespace: str, max_memory_bytes: int = 4 * 2**30, disk_dir: Optional[str] = None):
+        self.namespace = namespace
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = None
+        if disk_dir:
+            if safe_open is None:
+                raise ImportError("safetensors package is required. Install with: pip install safetensors")
+            namespace_hash = hashlib.sha256(namespace.encode('utf-8')).hexdigest()[:16]
+            self.disk_dir = Path(disk_dir) / namespace_hash
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        # key -> (spec, cpu tensors, bytes)
+        self._memory: "OrderedDict[str, Tuple[Dict, Dict[str, torch.Tensor], int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._images: Optional[List[str]] = None
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+    def attach(self, tower: torch.nn.Module):
+        # Route the tower's forward through the cache while images() is active. Only the
+        # instance attribute changes, so the state dict (and saved copies) are unaffected.
+        encode = tower.forward
+
+        def forward(*args, **kwargs):
+            if self._images is None:
+                return encode(*args, **kwargs)
+            key = self.key(self._images, args, kwargs)
+            device = next((t.device for t in list(args) + list(kwargs.values()) if isinstance(t, torch.Tensor)), "cpu")
+            cached = self.get(key, device)
+            if cached is not None:
+                return cached
+            output = encode(*args, **kwargs)
+            self.put(key, output)
+            return output
+
+        tower.forward = forward
+
+    @contextlib.contextmanager
+    def images(self, image_digests: List[str]):
+        # Encoder calls inside the block encode exactly these images, in this order
+        self._images = image_digests
+        try:
+            yield
+        finally:
+            self._images = None
+
+    def key(self, image_digests: List[str], args, kwargs) -> str:
+        # Input shapes separate e.g. a batch expanded for several samples from a single prompt
+        shapes = [[name, list(value.shape), str(value.dtype)]
+                  for name, value in list(enumerate(args)) + sorted(kwargs.items())
+                  if isinstance(value, torch.Tensor)]
+        payload = json.dumps({"namespace": self.namespace, "images": image_digests, "inputs": shapes}, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.safetensors"
+
+    def get(self, key: str, device):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            spec, tensors, _ = self._memory[key]
+            self.hits += 1
+            return _unpack(spec, tensors, device)
+
+        if self.disk_dir is not None and self._path(key).exists():
+            tensors = {}
+            with safe_open(str(self._path(key)), framework="pt", device="cpu") as f:
+                spec = json.loads(f.metadata()["spec"])
+                for name in f.keys():
+                    tensors[name] = f.get_tensor(name)
+            self._remember(key, spec, tensors)
+            self.hits += 1
+            return _unpack(spec, tensors, device)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, output):
+        tensors: Dict[str, torch.Tensor] = {}
+        try:
+            spec = _pack(output, tensors)
+        except TypeError as e:
+            print(f"[WARN] {e}; vision encoder output left uncached")
+            return
+        self._remember(key, spec, tensors)
+
+    def _remember(self, key: str, spec: Dict, tensors: Dict[str, torch.Tensor]):
+        size = sum(t.numel() * t.element_size() for t in tensors.values())
+        self._memory[key] = (spec, tensors, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            old_key, (old_spec, old_tensors, old_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            self._spill(old_key, old_spec, old_tensors)
+
+    def _spill(self, key: str, spec: Dict, tensors: Dict[str, torch.Tensor]):
+        if self.disk_dir is None or self._path(key).exists():
+            return
+        tmp_path = self._path(key).with_suffix(f".{os.getpid()}.tmp")
+        save_file(tensors, str(tmp_path), metadata={"namespace": self.namespace, "spec": json.dumps(spec)})
+        os.replace(tmp_path, self._path(key))
+        self.spilled += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "spilled": self.spilled,
+                "memory_entries": len(self._memory), "memory_bytes": self._memory_bytes}
@@ -1,23 +1,64 @@
 import argparse
 import json
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Sequence
 
-from inference.llama_inference import create_llama_inference
-from inference.openai_inference import create_openai_inference
-from inference.gemini_inference import create_gemini_inference
+from inference.registry import LOCAL_BACKENDS, SHARED_BACKENDS, get_inference, release_inference, supports_model
+from inference.residency import configure_residency
 
-from prompts.prompts import get_prompts_by_group, LEARNER_PROFILE_CONFIGS
-from data.question_data import get_question, get_questions_by_grade
+from prompts.prompts import get_prompts_by_group
+from prompts.profiles import ProfileCohort, get_profile_config, register_cohort
+from data.question_data import get_question, get_questions_by_grade, use_question_bank
+from data.image_shards import register_image_shards
+from harness.planner import iter_jobs, count_jobs
+from harness.dedupe import RequestCoalescer, canonical_request_key
+from harness.sampling import AdaptiveSampler, SAMPLE_METRICS
+from harness.costs import CostLedger, BudgetExceeded
+from harness.hedging import RequestHedger, DeadlineExceeded
+from harness.progress import ProgressTracker, PROGRESS_MODES
+from harness.profiling import PROFILERS, profile_section, profiled_run
+from harness.estimates import estimate_plan, load_history, print_plan
+from harness.parity import compare_backends, print_comparison
+from inference.uploads import use_image_uploads
+from config import MODEL_PRICES, UPLOAD_MANIFEST
 
 
 class AdaptiveLearningBenchmark:
     
-    def __init__(self, output_dir: str = "outputs"):
+    def __init__(self, output_dir: str = "outputs", dedupe: bool = False, samples: int = 1,
+                 max_cost: Optional[float] = None, max_tokens: Optional[int] = None,
+                 cache_layout: bool = False, context_cache: bool = False,
+                 progress: Optional[ProgressTracker] = None, deadline_seconds: Optional[float] = None,
+                 hedge: bool = False, hedge_quantile: float = 0.95, deadline_retries: int = 1):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.results = []
+        # Extra keyword arguments passed to every inference.generate call
+        self.generation_params = {}
+        if samples > 1:
+            self.generation_params["num_samples"] = samples
+        # Static content (system prompt, image) ahead of the profile text for provider prompt caching
+        if cache_layout:
+            self.generation_params["cache_layout"] = True
+        # Gemini: system prompt + image served from an explicit context cache per (grade, group, question)
+        if context_cache:
+            self.generation_params["context_cache"] = True
+        # With dedupe, identical requests (same model, messages, images, params) run once
+        self.coalescer = RequestCoalescer() if dedupe else None
+        # Live token/cost totals; requests are refused once a budget would be exceeded
+        self.ledger = CostLedger(MODEL_PRICES, max_cost=max_cost, max_tokens=max_tokens)
+        # Live dashboard/status file; per-evaluation log lines are dropped while the dashboard redraws
+        self.progress = progress
+        self.verbose = progress is None or not progress.live
+        # Per-call deadlines and hedged duplicates for slow API calls; hedges need budget headroom
+        self.hedger = RequestHedger(deadline_seconds=deadline_seconds, hedge=hedge, quantile=hedge_quantile,
+                                    retries=deadline_retries, budget_check=self.ledger.check, log=self.log)
+    
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
     
     def create_messages(self, system_prompt: str, user_prompt: str, image_paths: List[str], group: int = 4) -> List[Dict]:
         # Create messages based on group configuration
@@ -42,76 +83,37 @@ class AdaptiveLearningBenchmark:
         
         return messages
     
+    def create_inference(self, model_name: str, model_type: str):
+        # Model for the given backend type (see inference/registry.py): API backends are shared and
+        # local models stay resident until another model needs the accelerator
+        return get_inference(model_type, model_name)
+    
     def run_evaluation(self, model_name: str, model_type: str, learner_profile: str, question_id: str, 
                       group: int = 4, save_intermediate: bool = True) -> Dict:
-        print(f"\n{'='*60}")
-        print(f"Evaluating: {model_name}")
-        print(f"Learner: {learner_profile}")
-        print(f"Question: {question_id}")
-        print(f"Group: {group}")
-        print(f"{'='*60}\n")
-        
-        learner_data = LEARNER_PROFILE_CONFIGS.get(learner_profile, {})
-        if not learner_data:
-            raise ValueError(f"Unknown learner profile: {learner_profile}")
-        
-        question_data = get_question(question_id)
-        system_prompt, user_prompt = get_prompts_by_group(group, learner_profile)
-        
-        # Prepare messages with image
-        image_paths = [question_data["image_path"]]
-        messages = self.create_messages(system_prompt, user_prompt, image_paths, group=group)
-        
-        # Load and run model
-        if model_type == "llama":
-            inference = create_llama_inference(model_name)
-            result = inference.generate(messages=messages, images=image_paths)
-        elif model_type == "openai":
-            inference = create_openai_inference(model_name)
-            result = inference.generate(messages=messages, images=image_paths)
-        elif model_type == "gemini":
-            inference = create_gemini_inference(model_name)
-            result = inference.generate(messages=messages, images=image_paths)
-        else:
-            raise ValueError(f"Unknown model type: {model_type}")
-        
-        # Prepare result - Group 1 doesn't include prompts in output
-        evaluation_result = {
-            "timestamp": datetime.now().isoformat(),
-            "model": model_name,
-            "model_type": model_type,
-            "learner_profile": learner_profile,
-            "learner_data": learner_data,
-            "question_id": question_id,
-            "question_data": question_data,
-            "group": group,
-            "response": result["response"],
-            "metadata": {k: v for k, v in result.items() if k != "response"}
-        }
-        
-        # Only include prompts for groups 2, 3, 4 (not group 1)
-        if group != 1:
-            evaluation_result["system_prompt"] = system_prompt
-            evaluation_result["user_prompt"] = user_prompt
-        
-        if save_intermediate:
-            self.save_result(evaluation_result)
-        
-        self.results.append(evaluation_result)
-        return evaluation_result
+        # Loads the model on demand for this evaluation
+        return self.run_evaluation_with_inference(
+            inference=None,
+            model_name=model_name,
+            model_type=model_type,
+            learner_profile=learner_profile,
+            question_id=question_id,
+            group=group,
+            save_intermediate=save_intermediate
+        )
     
     def run_evaluation_with_inference(self, inference, model_name: str, model_type: str, 
                                      learner_profile: str, question_id: str, group: int = 4, 
-                                     save_intermediate: bool = True) -> Dict:
+                                     save_intermediate: bool = True, sample_index: Optional[int] = None) -> Dict:
         # Same as run_evaluation but uses pre-loaded inference instance for memory efficiency
-        print(f"\n{'='*60}")
-        print(f"Evaluating: {model_name}")
-        print(f"Learner: {learner_profile}")
-        print(f"Question: {question_id}")
-        print(f"Group: {group}")
-        print(f"{'='*60}\n")
+        if self.verbose:
+            print(f"\n{'='*60}")
+            print(f"Evaluating: {model_name}")
+            print(f"Learner: {learner_profile}")
+            print(f"Question: {question_id}")
+            print(f"Group: {group}")
+            print(f"{'='*60}\n")
         
-        learner_data = LEARNER_PROFILE_CONFIGS.get(learner_profile, {})
+        learner_data = get_profile_config(learner_profile)
         if not learner_data:
             raise ValueError(f"Unknown learner profile: {learner_profile}")
         
@@ -121,8 +123,20 @@ class AdaptiveLearningBenchmark:
         image_paths = [question_data["image_path"]]
         messages = self.create_messages(system_prompt, user_prompt, image_paths, group=group)
         
-        # Use pre-loaded inference instance
-        result = inference.generate(messages=messages, images=image_paths)
+        cell = f"{group}_{model_name}_{learner_profile}_{question_id}"
+        token = self.progress.job_started(cell) if self.progress else None
+        try:
+            result, request_key, shared_from = self._generate(
+                inference, model_name, model_type, messages, image_paths, cell, group, learner_profile
+            )
+        except BudgetExceeded:
+            if self.progress:
+                self.progress.job_dropped(token)
+            raise
+        except Exception as e:
+            if self.progress:
+                self.progress.job_failed(token, e)
+            raise
         
         # Prepare result - Group 1 doesn't include prompts in output
         evaluation_result = {
@@ -135,60 +149,113 @@ class AdaptiveLearningBenchmark:
             "question_data": question_data,
             "group": group,
             "response": result["response"],
-            "metadata": {k: v for k, v in result.items() if k != "response"}
+            "metadata": {k: v for k, v in result.items() if k not in ("response", "responses")}
         }
         
+        # Multi-sample runs keep every sample from the single request
+        responses = result.get("responses")
+        if responses and len(responses) > 1:
+            evaluation_result["responses"] = responses
+        
+        # Shared results cost nothing extra; the cell that sent the request is charged
+        if shared_from is None:
+            evaluation_result["metadata"]["cost_usd"] = self.ledger.record(
+                model_name, group, learner_profile, evaluation_result["metadata"]
+            )
+        
+        if request_key is not None:
+            evaluation_result["metadata"]["request_key"] = request_key
+            # Shared results were produced by another cell with an identical request
+            evaluation_result["metadata"]["shared"] = shared_from is not None
+            if shared_from is not None:
+                evaluation_result["metadata"]["shared_from"] = shared_from
+        
+        # Repeated draws of the same cell (adaptive sampling) are numbered
+        if sample_index is not None:
+            evaluation_result["sample_index"] = sample_index
+        
         # Only include prompts for groups 2, 3, 4 (not group 1)
         if group != 1:
             evaluation_result["system_prompt"] = system_prompt
             evaluation_result["user_prompt"] = user_prompt
         
+        if self.progress:
+            self.progress.job_finished(token, model_type, evaluation_result["metadata"])
+        
         if save_intermediate:
             self.save_result(evaluation_result)
         
         self.results.append(evaluation_result)
         return evaluation_result
     
+    def _generate(self, inference, model_name: str, model_type: str, messages: List[Dict],
+                  image_paths: List[str], cell: str, group: int = 4, learner_profile: str = ""):
+        # Returns (result, request_key, shared_from); the model is only loaded if the call runs
+        def call():
+            self.ledger.check(model_name)
+            engine = inference if inference is not None else self.create_inference(model_name, model_type)
+            
+            def send(timeout: Optional[float]) -> Dict:
+                params = dict(self.generation_params, timeout=timeout) if timeout else self.generation_params
+                return engine.generate(messages=messages, images=image_paths, **params)
+            
+            start = time.perf_counter()
+            # Losing hedges and abandoned calls are still billed to this cell
+            result = self.hedger.run(
+                model_name, send, hedgeable=model_type in SHARED_BACKENDS,
+                on_discarded=lambda discarded: self.ledger.record(model_name, group, learner_profile, discarded),
+                on_retry=self.progress.job_retried if self.progress else None
+            )
+            # Per-call latency feeds the throughput estimates of `main.py plan`
+            result["latency_seconds"] = round(time.perf_counter() - start, 3)
+            return result
+        
+        if self.coalescer is None:
+            return call(), None, None
+        
+        request_key = canonical_request_key(model_name, messages, image_paths, self.generation_params)
+        result, shared_from = self.coalescer.do(request_key, call, owner=cell)
+        return result, request_key, shared_from
+    
     def save_result(self, result: Dict):
         # Save single evaluation result to JSON file
         # Format: {group}_{model_name}_{profile}_{question}.json
         model_name = result['model'].replace('/', '_')
-        filename = f"{result['group']}_{model_name}_{result['learner_profile']}_{result['question_id']}.json"
+        filename = f"{result['group']}_{model_name}_{result['learner_profile']}_{result['question_id']}"
+        if result.get("sample_index") is not None:
+            filename += f"_s{result['sample_index']}"
+        filename += ".json"
         
         output_path = self.output_dir / filename
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        with profile_section("result_saving"):
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
         
-        print(f"Saved result to: {output_path}")
+        self.log(f"Saved result to: {output_path}")
     
-    def run_full_evaluation(self, models: List[Dict], save_summary: bool = True):
+    def run_full_evaluation(self, models: List[Dict], save_summary: bool = True,
+                            cohort: Optional[ProfileCohort] = None, groups: Sequence[int] = (4,)):
         # Run evaluation across all models, profiles, and questions
         print(f"\n{'='*60}")
         print("STARTING FULL EVALUATION")
         print(f"{'='*60}\n")
         
-        learner_profiles = list(LEARNER_PROFILE_CONFIGS.keys())
-        
-        for model_config in models:
-            model_name = model_config["name"]
-            model_type = model_config["type"]
-            
-            for profile in learner_profiles:
-                learner_data = LEARNER_PROFILE_CONFIGS.get(profile, {})
-                if not learner_data:
-                    continue
-                
-                grade = learner_data["grade"]
-                questions = get_questions_by_grade(grade)
-                
-                for question_id, question_data in questions.items():
-                    result = self.run_evaluation(
-                        model_name=model_name,
-                        model_type=model_type,
-                        learner_profile=profile,
-                        question_id=question_id
-                    )
-                    print(f"✓ Completed: {model_name} - {profile} - {question_id}")
+        # Jobs are streamed from the planner rather than expanded up front
+        total = count_jobs(models, cohort=cohort, groups=groups)
+        self.seed_budget(next(iter_jobs([model], cohort=cohort, groups=groups)) for model in models)
+        if self.progress:
+            self.progress.set_total(total)
+        for current, job in enumerate(iter_jobs(models, cohort=cohort, groups=groups), start=1):
+            try:
+                result = self.run_evaluation(**job)
+            except BudgetExceeded as e:
+                self.cancel_remaining(total - current + 1, e)
+                break
+            except DeadlineExceeded as e:
+                self.log(f"✗ [{current}/{total}] {e}; skipping {job['learner_profile']} - {job['question_id']}")
+                continue
+            self.log(f"✓ [{current}/{total}] Completed: {job['model_name']} - {job['learner_profile']} - {job['question_id']} "
+                     f"(run cost ${self.ledger.total['cost_usd']:.4f})")
         
         if save_summary:
             self.save_summary()
@@ -196,8 +263,87 @@ class AdaptiveLearningBenchmark:
         print(f"\n{'='*60}")
         print("EVALUATION COMPLETE")
         print(f"Total results: {len(self.results)}")
+        if self.coalescer is not None:
+            stats = self.coalescer.stats()
+            print(f"Requests sent: {stats['executed']} (shared: {stats['shared']})")
+        self.print_hedging()
         print(f"{'='*60}\n")
     
+    def run_adaptive_evaluation(self, jobs: List[Dict], inference=None, metric: str = "words",
+                                min_samples: int = 3, max_samples: int = 20, rel_tolerance: float = 0.1,
+                                budget: Optional[int] = None) -> Dict:
+        # Sample each cell until the metric's 95% CI is within rel_tolerance of its mean,
+        # spending any remaining budget on the cells with the widest intervals
+        metric_fn = SAMPLE_METRICS[metric]
+        self.seed_budget(jobs)
+        cells = {f"{job['group']}_{job['model_name']}_{job['learner_profile']}_{job['question_id']}": job for job in jobs}
+        sampler = AdaptiveSampler(cells.keys(), min_samples=min_samples, max_samples=max_samples,
+                                  rel_tolerance=rel_tolerance, budget=budget)
+        if self.progress:
+            # The number of draws is only known up front when a budget caps it
+            self.progress.set_total(budget)
+        
+        cell = sampler.next_cell()
+        while cell is not None:
+            job = cells[cell]
+            try:
+                result = self.run_evaluation_with_inference(
+                    inference=inference, sample_index=sampler.cell_draws[cell], **job
+                )
+            except BudgetExceeded as e:
+                self.cancel_remaining(0, e)
+                break
+            except DeadlineExceeded as e:
+                # Retries already ran out; drawing the cell again would most likely time out too
+                sampler.exhaust(cell)
+                self.log(f"✗ [draw {sampler.draws}] {e}; no further draws of {cell}")
+                cell = sampler.next_cell()
+                continue
+            responses = result.get("responses") or [result["response"]]
+            sampler.record(cell, [metric_fn(r or "") for r in responses])
+            self.log(f"✓ [draw {sampler.draws}] {cell}: n={sampler.samples(cell)} "
+                     f"mean={sampler.stats[cell].mean:.1f} ±{sampler.stats[cell].half_width():.1f}")
+            cell = sampler.next_cell()
+        
+        summary = sampler.summary()
+        summary["metric"] = metric
+        summary_path = self.output_dir / "adaptive_sampling.json"
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Adaptive sampling: {summary['draws']} draws, "
+              f"{summary['converged_cells']}/{len(cells)} cells converged. Saved to: {summary_path}")
+        return summary
+    
+    def seed_budget(self, jobs: Iterable[Dict]):
+        # With a budget, each model's first call is checked against a plan estimate (its first
+        # job) instead of passing unchecked because nothing has been spent yet
+        if self.ledger.max_cost is None and self.ledger.max_tokens is None:
+            return
+        first_jobs: Dict[str, Dict] = {}
+        for job in jobs:
+            first_jobs.setdefault(job["model_name"], job)
+        plan = estimate_plan(first_jobs.values(), self.create_messages, history=load_history(str(self.output_dir)),
+                             samples=self.generation_params.get("num_samples", 1))
+        for row in plan["models"]:
+            tokens = row["prompt_tokens"] + row["image_tokens"] + row["completion_tokens"]
+            self.ledger.seed(row["model"], row["cost_usd"], tokens)
+    
+    def cancel_remaining(self, remaining: int, reason: BudgetExceeded):
+        # Budget hit: queued jobs are dropped before they are sent
+        self.ledger.cancelled += remaining
+        if self.progress:
+            self.progress.jobs_cancelled(remaining)
+        print(f"\n[BUDGET] {reason}. Cancelled {remaining} queued evaluation(s).\n")
+    
+    def print_hedging(self):
+        if not self.hedger.active:
+            return
+        stats = self.hedger.stats()
+        print(f"Hedged calls: {stats['hedged']}/{stats['calls']} (hedge won: {stats['hedge_wins']}, "
+              f"skipped for budget: {stats['hedges_skipped_budget']}); deadline exceeded: "
+              f"{stats['deadline_exceeded']}, retried: {stats['retried']}; "
+              f"discarded calls cost ${stats['discarded_cost_usd']:.4f}")
+    
     def save_summary(self):
         # Save summary of all evaluations
         summary = {
@@ -211,7 +357,9 @@ class AdaptiveLearningBenchmark:
                     "timestamp": r["timestamp"]
                 }
                 for r in self.results
-            ]
+            ],
+            "costs": self.ledger.summary(),
+            "hedging": self.hedger.stats()
         }
         
         summary_path = self.output_dir / "summary.json"
@@ -221,8 +369,22 @@ class AdaptiveLearningBenchmark:
         print(f"Saved summary to: {summary_path}")
 
 
+def parse_selection(args):
+    # Profiles, questions and groups from CLI lists; each accepts space- and/or comma-separated values
+    def split(values):
+        items = []
+        for value in values or []:
+            items.extend(v.strip() for v in value.split(',') if v.strip())
+        return items
+    
+    return split(args.profile), split(args.question), [int(g) for g in split(args.group)]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run adaptive learning LLM benchmark")
+    parser.add_argument("command", nargs="?", choices=["run", "plan", "compare"], default="run",
+                       help="'plan' estimates tokens, cost and wall time for the selected jobs without sending anything; "
+                            "'compare' checks --local-backend against --compare-with for --model (parity and throughput)")
     parser.add_argument("--model", type=str, help="Specific model to evaluate (optional)")
     parser.add_argument("--profile", type=str, nargs='+', 
                        help="Specific learner profile(s) to evaluate (can specify multiple, space-separated or comma-separated)")
@@ -232,8 +394,114 @@ def main():
     parser.add_argument("--full", action="store_true", help="Run full evaluation across all combinations")
     parser.add_argument("--group", type=str, nargs='+', default=["4"],
                        help="Prompt group(s) to evaluate (can specify multiple, space-separated or comma-separated: 1,2,3,4)")
+    parser.add_argument("--question-bank", type=str,
+                       help="JSONL question manifest to use instead of the built-in questions")
+    parser.add_argument("--image-root", type=str,
+                       help="Directory that relative image paths in --question-bank resolve against (default: manifest directory)")
+    parser.add_argument("--image-shards", type=str,
+                       help="Directory of packed image shards that shard:// image paths are read from")
+    parser.add_argument("--cohort-size", type=int,
+                       help="Evaluate a synthetic cohort of this many sampled learner profiles (ids gen_000000, ...)")
+    parser.add_argument("--cohort-seed", type=int, default=0, help="Random seed for --cohort-size sampling")
+    parser.add_argument("--cohort-grid", action="store_true",
+                       help="Evaluate every combination of the profile sweep space (ids grid_000000, ...)")
+    parser.add_argument("--dedupe", action="store_true",
+                       help="Send each distinct request once and share its response across identical cells")
+    parser.add_argument("--samples", type=int, default=1,
+                       help="Responses to sample per evaluation from a single request (OpenAI n, Gemini candidate_count, HF num_return_sequences)")
+    parser.add_argument("--adaptive-samples", action="store_true",
+                       help="Sample each cell until the metric's confidence interval is tight enough (see --ci-tolerance)")
+    parser.add_argument("--sample-metric", type=str, default="words", choices=sorted(SAMPLE_METRICS),
+                       help="Per-response metric tracked by --adaptive-samples")
+    parser.add_argument("--min-samples", type=int, default=3, help="Samples per cell before early stopping is considered")
+    parser.add_argument("--max-samples", type=int, default=20, help="Maximum samples per cell")
+    parser.add_argument("--ci-tolerance", type=float, default=0.1,
+                       help="Stop a cell once its 95%% CI half-width is within this fraction of the mean")
+    parser.add_argument("--sample-budget", type=int, help="Total draws allowed across all cells")
+    parser.add_argument("--cache-layout", action="store_true",
+                       help="Order each request system prompt -> image -> profile text so providers can cache the shared prefix")
+    parser.add_argument("--gemini-context-cache", action="store_true",
+                       help="Gemini: keep system prompt + image in an explicit context cache and send only the learner text")
+    parser.add_argument("--upload-images", action="store_true",
+                       help="Upload each question image once via the provider's file API and send only its ID")
+    parser.add_argument("--upload-manifest", type=str, default=str(UPLOAD_MANIFEST),
+                       help="Manifest of uploaded image IDs and expiry times")
+    parser.add_argument("--upload-stub", type=str,
+                       help="Upload to this local directory instead of a provider (offline testing)")
+    parser.add_argument("--progress", type=str, default="auto", choices=PROGRESS_MODES,
+                       help="Progress display: live dashboard, periodic log lines, or off (auto: live on a terminal)")
+    parser.add_argument("--status-file", type=str,
+                       help="JSON status file rewritten every second for schedulers (default: <output>/status.json)")
+    parser.add_argument("--profile-run", type=str, nargs="?", const="cprofile", choices=PROFILERS,
+                       help="Profile the run (harness CPU, torch.profiler for local generate, tracemalloc around "
+                            "image loading/result saving) into <output>/profiles/<timestamp>/")
+    parser.add_argument("--local-backend", type=str, default="llama", choices=LOCAL_BACKENDS,
+                        help="Backend for the local models (openvino: INT8 CPU inference; gguf: quantized llama.cpp; "
+                             "endpoint: OpenAI-compatible serving engine at --endpoint-url)")
+    parser.add_argument("--endpoint-url", type=str,
+                        help="Base URL of the serving engine for --local-backend endpoint (default: LOCAL_ENDPOINT in config.py)")
+    parser.add_argument("--model-alias", type=str, nargs='+',
+                        help="NAME=SERVED_ID pairs mapping harness model names to the ids the endpoint serves")
+    parser.add_argument("--compare-with", type=str, default="llama", choices=LOCAL_BACKENDS,
+                        help="Reference backend for 'compare'")
+    parser.add_argument("--compare-tokens", type=int, default=128, help="Maximum new tokens per prompt for 'compare'")
+    parser.add_argument("--warm-models", type=int, default=0,
+                        help="Park up to N recently used local models in host RAM instead of unloading them")
+    parser.add_argument("--warm-disk", type=str,
+                        help="Directory for memory-mappable copies of local models pushed out of memory")
+    parser.add_argument("--warm-disk-models", type=int, default=2, help="Maximum model copies kept in --warm-disk")
+    parser.add_argument("--deadline", type=float,
+                        help="Per-call deadline in seconds; API calls past it are abandoned (and retried per --deadline-retries)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate API request once a call runs past the model's observed latency quantile")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95, help="Latency quantile that triggers a hedge")
+    parser.add_argument("--deadline-retries", type=int, default=1, help="Retries for API calls that miss --deadline")
+    parser.add_argument("--max-cost", type=float, help="Stop sending requests once the run would exceed this many USD")
+    parser.add_argument("--max-tokens", type=int, help="Stop sending requests once the run would exceed this many tokens")
     
     args = parser.parse_args()
+    if args.min_samples < 2:
+        parser.error("--min-samples must be at least 2 to estimate variance")
+    
+    if args.adaptive_samples and args.dedupe:
+        print("Error: --adaptive-samples needs independent draws and cannot be combined with --dedupe")
+        return
+    # Validate groups (every command expands the same grid)
+    for g in args.group:
+        for value in g.split(','):
+            if value.strip() and value.strip() not in ("1", "2", "3", "4"):
+                print(f"Error: Invalid group {value.strip()}. Must be 1, 2, 3, or 4.")
+                return
+    adaptive_kwargs = {
+        "metric": args.sample_metric,
+        "min_samples": args.min_samples,
+        "max_samples": args.max_samples,
+        "rel_tolerance": args.ci_tolerance,
+        "budget": args.sample_budget,
+    }
+    
+    if args.question_bank:
+        use_question_bank(args.question_bank, image_root=args.image_root)
+    if args.image_shards:
+        register_image_shards(args.image_shards).prefetch()
+    if args.upload_stub and args.model != "mock":
+        # Stub file IDs mean nothing to a real provider
+        print("Error: --upload-stub only works with --model mock")
+        return
+    if args.upload_images:
+        use_image_uploads(args.upload_manifest, stub_dir=args.upload_stub)
+    if args.endpoint_url or args.model_alias:
+        # Imported here so runs without an endpoint never load the OpenAI client stack
+        from inference.endpoint_inference import configure_endpoint, parse_aliases
+        configure_endpoint(base_url=args.endpoint_url, aliases=parse_aliases(args.model_alias))
+    if args.warm_models or args.warm_disk:
+        configure_residency(max_host=args.warm_models, disk_dir=args.warm_disk, max_disk=args.warm_disk_models)
+    
+    cohort = None
+    if args.cohort_grid:
+        cohort = register_cohort(ProfileCohort.grid())
+    elif args.cohort_size:
+        cohort = register_cohort(ProfileCohort.sample(args.cohort_size, seed=args.cohort_seed))
     
     # Available models
     models = [
@@ -244,81 +512,141 @@ def main():
         {"name": "o1", "type": "openai"},
         {"name": "gemini-2.5-flash", "type": "gemini"},
     ]
+    # Offline backend for dry runs: selectable with --model, never part of --full
+    offline_models = [{"name": "mock", "type": "mock"}]
+    if args.local_backend != "llama":
+        # Models the backend has no build of are left out of the run rather than failing mid-sweep
+        remapped = []
+        for m in models:
+            if m["type"] == "llama":
+                if not supports_model(args.local_backend, m["name"]):
+                    print(f"[{args.local_backend}] No build configured for {m['name']}; skipping it")
+                    continue
+                m = dict(m, type=args.local_backend)
+            remapped.append(m)
+        models = remapped
     
-    benchmark = AdaptiveLearningBenchmark(output_dir=args.output)
+    progress = None
+    if args.command == "run":
+        progress = ProgressTracker(args.status_file or str(Path(args.output) / "status.json"), mode=args.progress)
     
-    if args.full:
-        benchmark.run_full_evaluation(models)
-    else:
+    benchmark = AdaptiveLearningBenchmark(output_dir=args.output, dedupe=args.dedupe, samples=args.samples,
+                                          max_cost=args.max_cost, max_tokens=args.max_tokens,
+                                          cache_layout=args.cache_layout,
+                                          context_cache=args.gemini_context_cache,
+                                          progress=progress, deadline_seconds=args.deadline,
+                                          hedge=args.hedge, hedge_quantile=args.hedge_quantile,
+                                          deadline_retries=args.deadline_retries)
+    
+    if args.command == "compare":
+        model_config = next((m for m in models if m["name"] == args.model), None)
+        if not model_config or model_config["type"] not in LOCAL_BACKENDS or not (args.profile and args.question):
+            print("Error: 'compare' needs a local --model, --profile and --question")
+            return
+        if args.local_backend == args.compare_with:
+            print("Error: --local-backend and --compare-with must differ")
+            return
+        profiles, questions, groups = parse_selection(args)
+        jobs = [{"learner_profile": profile, "question_id": question_id, "group": group}
+                for profile in profiles for question_id in questions for group in groups]
+        report = compare_backends(args.model, args.compare_with, args.local_backend, jobs,
+                                  benchmark.create_messages, max_new_tokens=args.compare_tokens)
+        print_comparison(report)
+        report_path = Path(args.output) / "parity.json"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nSaved comparison to: {report_path}")
+        return
+    
+    if args.command == "plan":
         if args.model and args.profile and args.question:
-            model_config = next((m for m in models if m["name"] == args.model), None)
+            profiles, questions, groups = parse_selection(args)
+            model_config = next((m for m in models + offline_models if m["name"] == args.model), None)
             if not model_config:
                 print(f"Error: Unknown model: {args.model}")
                 return
-            
-            # Parse profiles: handle both space-separated and comma-separated
-            profiles = []
-            for p in args.profile:
-                if ',' in p:
-                    profiles.extend([p.strip() for p in p.split(',') if p.strip()])
-                else:
-                    profiles.append(p.strip())
-            
-            # Parse questions: handle both space-separated and comma-separated
-            questions = []
-            for q in args.question:
-                if ',' in q:
-                    questions.extend([q.strip() for q in q.split(',') if q.strip()])
-                else:
-                    questions.append(q.strip())
-            
-            # Parse groups: handle both space-separated and comma-separated
-            groups = []
-            for g in args.group:
-                if ',' in g:
-                    groups.extend([int(g.strip()) for g in g.split(',') if g.strip()])
-                else:
-                    groups.append(int(g.strip()))
-            
-            # Validate groups
-            for g in groups:
-                if g not in [1, 2, 3, 4]:
-                    print(f"Error: Invalid group {g}. Must be 1, 2, 3, or 4.")
-                    return
-            
-            # Load model once and reuse for all evaluations to save memory
-            inference = None
-            if model_config["type"] == "llama":
-                inference = create_llama_inference(args.model)
-            elif model_config["type"] == "openai":
-                inference = create_openai_inference(args.model)
-            elif model_config["type"] == "gemini":
-                inference = create_gemini_inference(args.model)
-            
-            # Run evaluation for each combination: profile -> question -> group
-            total = len(profiles) * len(questions) * len(groups)
-            current = 0
-            print(f"\nRunning {total} evaluations: {len(profiles)} profiles × {len(questions)} questions × {len(groups)} groups\n")
-            
-            for profile in profiles:
-                for question_id in questions:
-                    for group in groups:
-                        current += 1
-                        result = benchmark.run_evaluation_with_inference(
-                            inference=inference,
-                            model_name=args.model,
-                            model_type=model_config["type"],
-                            learner_profile=profile,
-                            question_id=question_id,
-                            group=group
-                        )
-                        print(f"✓ [{current}/{total}] Completed: {args.model} - {profile} - {question_id} - Group {group}\n")
-            
-            # Clean up model after all evaluations
-            if inference and hasattr(inference, 'cleanup'):
-                inference.cleanup()
+            jobs = (
+                {"model_name": args.model, "model_type": model_config["type"],
+                 "learner_profile": profile, "question_id": question_id, "group": group}
+                for profile in profiles for question_id in questions for group in groups
+            )
         else:
-            print("Specify --model, --profile, and --question, or use --full for full evaluation")
+            # Full grid, optionally restricted to --model
+            planned = [m for m in models if not args.model or m["name"] == args.model]
+            jobs = iter_jobs(planned, cohort=cohort, groups=parse_selection(args)[2])
+        plan = estimate_plan(jobs, benchmark.create_messages, history=load_history(args.output),
+                             samples=args.samples)
+        print_plan(plan)
+        plan_path = Path(args.output) / "plan.json"
+        with open(plan_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2)
+        print(f"\nSaved plan to: {plan_path}")
+        return
+    
+    # The status file, dashboard and profile cover the whole run, including early returns and failures
+    profile_dir = Path(args.output) / "profiles" / datetime.now().strftime("%Y%m%d-%H%M%S")
+    with progress, profiled_run(str(profile_dir), args.profile_run):
+        try:
+            if args.full and args.adaptive_samples:
+                # Adaptive allocation needs every cell up front
+                benchmark.run_adaptive_evaluation(list(iter_jobs(models, cohort=cohort, groups=parse_selection(args)[2])),
+                                                  **adaptive_kwargs)
+                benchmark.save_summary()
+            elif args.full:
+                benchmark.run_full_evaluation(models, cohort=cohort, groups=parse_selection(args)[2])
+            else:
+                if args.model and args.profile and args.question:
+                    model_config = next((m for m in models + offline_models if m["name"] == args.model), None)
+                    if not model_config:
+                        print(f"Error: Unknown model: {args.model}")
+                        return
+                    
+                    profiles, questions, groups = parse_selection(args)
+                    
+                    # Load model once and reuse for all evaluations to save memory
+                    inference = benchmark.create_inference(args.model, model_config["type"])
+                    
+                    jobs = [
+                        {"model_name": args.model, "model_type": model_config["type"],
+                         "learner_profile": profile, "question_id": question_id, "group": group}
+                        for profile in profiles for question_id in questions for group in groups
+                    ]
+                    
+                    if args.adaptive_samples:
+                        benchmark.run_adaptive_evaluation(jobs, inference=inference, **adaptive_kwargs)
+                        benchmark.save_summary()
+                        return
+                    
+                    # Run evaluation for each combination: profile -> question -> group
+                    total = len(jobs)
+                    progress.set_total(total)
+                    benchmark.seed_budget(jobs)
+                    benchmark.log(f"\nRunning {total} evaluations: {len(profiles)} profiles × {len(questions)} questions × {len(groups)} groups\n")
+                    
+                    for current, job in enumerate(jobs, start=1):
+                        try:
+                            result = benchmark.run_evaluation_with_inference(inference=inference, **job)
+                        except BudgetExceeded as e:
+                            benchmark.cancel_remaining(total - current + 1, e)
+                            break
+                        except DeadlineExceeded as e:
+                            benchmark.log(f"✗ [{current}/{total}] {e}; skipping {job['learner_profile']} - {job['question_id']} - Group {job['group']}\n")
+                            continue
+                        benchmark.log(f"✓ [{current}/{total}] Completed: {args.model} - {job['learner_profile']} - {job['question_id']} - Group {job['group']} "
+                                      f"(run cost ${benchmark.ledger.total['cost_usd']:.4f})\n")
+                    
+                    benchmark.save_summary()
+                    
+                    if benchmark.coalescer is not None:
+                        stats = benchmark.coalescer.stats()
+                        print(f"Requests sent: {stats['executed']} (shared: {stats['shared']})")
+                    benchmark.print_hedging()
+                else:
+                    print("Specify --model, --profile, and --question, or use --full for full evaluation")
+        finally:
+            benchmark.hedger.close()
+            # Unload local models (verifying the memory came back) and release provider-side caches
+            release_inference()
 
 
 if __name__ == "__main__":
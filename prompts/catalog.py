@@ -0,0 +1,98 @@
+import timeit
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
+
+from prompts.prompts import PROMPT_TABLE, get_prompts_by_group
+from data.question_data import ALL_QUESTIONS, get_question
+
+
+def tokenizer_id(tokenizer) -> str:
+    # Stable name for a HF tokenizer (name_or_path) or a tiktoken encoding (name)
+    return (
+        getattr(tokenizer, "name_or_path", None)
+        or getattr(tokenizer, "name", None)
+        or type(tokenizer).__name__
+    )
+
+
+def encode_text(tokenizer, text: str) -> Tuple[int, ...]:
+    if not text:
+        return ()
+    try:
+        # HF tokenizers: leave special tokens to the chat template
+        return tuple(tokenizer.encode(text, add_special_tokens=False))
+    except TypeError:
+        # tiktoken encodings do not take add_special_tokens
+        return tuple(tokenizer.encode(text))
+
+
+class PromptCatalog:
+    # Immutable prompt/question catalog keyed by (profile, group) and question_id,
+    # with pre-tokenized prompt variants cached per tokenizer
+
+    def __init__(self, prompt_table: Mapping[Tuple[str, int], Tuple[str, str]],
+                 questions: Mapping[str, dict]):
+        self._prompts = MappingProxyType(dict(prompt_table))
+        self._questions = MappingProxyType(dict(questions))
+        self._tokenized: Dict[str, Mapping] = {}
+
+    @property
+    def prompt_keys(self) -> List[Tuple[str, int]]:
+        return list(self._prompts.keys())
+
+    def prompts(self, profile_id: str, group: int) -> Tuple[str, str]:
+        prompts = self._prompts.get((profile_id, group))
+        if prompts is None:
+            return get_prompts_by_group(group, profile_id)
+        return prompts
+
+    def question(self, question_id: str) -> dict:
+        question = self._questions.get(question_id)
+        if question is None:
+            # Fall back to the active question bank (e.g. a large JSONL manifest)
+            return get_question(question_id)
+        return question
+
+    def tokenized(self, tokenizer) -> Mapping[Tuple[str, int], Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        # (system_ids, user_ids) for every (profile, group), encoded once per tokenizer
+        key = tokenizer_id(tokenizer)
+        if key not in self._tokenized:
+            # Identical strings repeat across profiles/groups, so encode each text only once
+            encoded: Dict[str, Tuple[int, ...]] = {}
+            table = {}
+            for cell, (system_prompt, user_prompt) in self._prompts.items():
+                for text in (system_prompt, user_prompt):
+                    if text not in encoded:
+                        encoded[text] = encode_text(tokenizer, text)
+                table[cell] = (encoded[system_prompt], encoded[user_prompt])
+            self._tokenized[key] = MappingProxyType(table)
+        return self._tokenized[key]
+
+    def prompt_token_counts(self, tokenizer, profile_id: str, group: int) -> Tuple[int, int]:
+        system_ids, user_ids = self.tokenized(tokenizer).get((profile_id, group), ((), ()))
+        return len(system_ids), len(user_ids)
+
+
+# Shared catalog for the built-in profiles and questions
+CATALOG = PromptCatalog(PROMPT_TABLE, ALL_QUESTIONS)
+
+
+def run_micro_benchmark(number: int = 100000):
+    # Compare per-call prompt rendering against catalog lookups
+    from prompts.prompts import _render_prompts_by_group
+    from data.question_data import GRADE4_QUESTIONS, GRADE8_QUESTIONS
+
+    cases = {
+        "render prompts (old path)": lambda: _render_prompts_by_group(4, "profile_3"),
+        "catalog prompts lookup": lambda: CATALOG.prompts("profile_3", 4),
+        "merge question dicts (old path)": lambda: {**GRADE4_QUESTIONS, **GRADE8_QUESTIONS}.get("G8Q3", {}),
+        "catalog question lookup": lambda: CATALOG.question("G8Q3"),
+    }
+    print(f"{'case':<34} {'ns/call':>10}")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:<34} {seconds / number * 1e9:>10.1f}")
+
+
+if __name__ == "__main__":
+    run_micro_benchmark()
@@ -0,0 +1,217 @@
+import random
+from array import array
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Learner profile configurations
+LEARNER_PROFILE_CONFIGS = {
+    "profile_1": {
+        "grade": 4,
+        "likes_math": True,
+        "confidence_level": "very confident",
+        "mastered_topics": "all mathematics topics in grade 4, including number, measurement and geometry, and data",
+        "timss_score": 615
+    },
+    "profile_2": {
+        "grade": 4,
+        "likes_math": False,
+        "confidence_level": "not confident",
+        "mastered_topics": "mathematics topics such as number and data in grade 4",
+        "timss_score": 390
+    },
+    "profile_3": {
+        "grade": 4,
+        "likes_math": True,
+        "confidence_level": "confident",
+        "mastered_topics": "all mathematics topics in grade 4, including number, measurement and geometry, and data",
+        "timss_score": 550
+    },
+    "profile_4": {
+        "grade": 8,
+        "likes_math": True,
+        "confidence_level": "very confident",
+        "mastered_topics": "all mathematics topics in grade 8, including number, algebra, geometry and measurement, and data and probability",
+        "timss_score": 625
+    },
+    "profile_5": {
+        "grade": 8,
+        "likes_math": False,
+        "confidence_level": "not confident",
+        "mastered_topics": "mathematics topics such as number and geometry in grade 4",
+        "timss_score": 390
+    },
+    "profile_6": {
+        "grade": 8,
+        "likes_math": True,
+        "confidence_level": "very confident",
+        "mastered_topics": "all mathematics topics in grade 8, including number, algebra, geometry and measurement, and data and probability",
+        "timss_score": 550
+    }
+}
+
+CONFIDENCE_LEVELS = ("not confident", "confident", "very confident")
+
+# Sweep space for synthetic cohorts; topics are per grade
+DEFAULT_PROFILE_SPACE = {
+    "grades": [4, 8],
+    "likes_math": [True, False],
+    "confidence_levels": list(CONFIDENCE_LEVELS),
+    "mastered_topics": {
+        4: [
+            "all mathematics topics in grade 4, including number, measurement and geometry, and data",
+            "mathematics topics such as number and data in grade 4",
+            "mathematics topics such as number in grade 4",
+        ],
+        8: [
+            "all mathematics topics in grade 8, including number, algebra, geometry and measurement, and data and probability",
+            "mathematics topics such as number and algebra in grade 8",
+            "mathematics topics such as number and geometry in grade 4",
+        ],
+    },
+    "timss_scores": list(range(350, 651, 25)),
+}
+
+
+def render_user_prompt(config: Dict) -> str:
+    # Start with grade and math attitude
+    introduction = f"I am a student from Grade {config['grade']}, "
+
+    if config['likes_math']:
+        introduction += "I like learning mathematics very much and "
+    else:
+        introduction += "I don't like learning mathematics and "
+
+    # Add confidence level
+    if config['confidence_level'] == "very confident":
+        introduction += "I am very confident in mathematics. "
+    elif config['confidence_level'] == "confident":
+        introduction += "I am confident in mathematics. "
+    else:
+        introduction += "I am not confident in mathematics. "
+
+    # Add mastered topics and TIMSS score
+    introduction += f"Now I have mastered {config['mastered_topics']}. "
+    introduction += f"I got {config['timss_score']} in the TIMSS 2019 Math Test. "
+
+    return f"{introduction}Can you teach me this math question?"
+
+
+class ProfileCohort:
+    # Synthetic learner profiles stored column-wise: one small typed array per attribute,
+    # with topic strings interned in a shared vocabulary. Profile dicts and prompts are
+    # built only when a profile is accessed.
+
+    def __init__(self, prefix: str, topics: Sequence[str]):
+        self.prefix = prefix
+        self.topics: Tuple[str, ...] = tuple(topics)
+        self.grades = array('B')
+        self.likes_math = array('B')
+        self.confidence = array('B')
+        self.topic_codes = array('H')
+        self.timss_scores = array('H')
+
+    def _append(self, grade: int, likes_math: bool, confidence_level: str, topic_code: int, timss_score: int):
+        self.grades.append(grade)
+        self.likes_math.append(int(likes_math))
+        self.confidence.append(CONFIDENCE_LEVELS.index(confidence_level))
+        self.topic_codes.append(topic_code)
+        self.timss_scores.append(timss_score)
+
+    @classmethod
+    def grid(cls, prefix: str = "grid", space: Optional[Dict] = None) -> "ProfileCohort":
+        # Every combination of the sweep space
+        space = space or DEFAULT_PROFILE_SPACE
+        cohort, topic_codes = cls._with_vocabulary(prefix, space)
+        for grade in space["grades"]:
+            for likes, confidence, topic, score in product(
+                space["likes_math"], space["confidence_levels"],
+                space["mastered_topics"][grade], space["timss_scores"]
+            ):
+                cohort._append(grade, likes, confidence, topic_codes[topic], score)
+        return cohort
+
+    @classmethod
+    def sample(cls, size: int, seed: int = 0, prefix: str = "gen", space: Optional[Dict] = None) -> "ProfileCohort":
+        # Uniform random draws from the sweep space, reproducible by seed
+        space = space or DEFAULT_PROFILE_SPACE
+        cohort, topic_codes = cls._with_vocabulary(prefix, space)
+        rng = random.Random(seed)
+        for _ in range(size):
+            grade = rng.choice(space["grades"])
+            cohort._append(
+                grade,
+                rng.choice(space["likes_math"]),
+                rng.choice(space["confidence_levels"]),
+                topic_codes[rng.choice(space["mastered_topics"][grade])],
+                rng.choice(space["timss_scores"]),
+            )
+        return cohort
+
+    @classmethod
+    def _with_vocabulary(cls, prefix: str, space: Dict):
+        topics: List[str] = []
+        for grade in space["grades"]:
+            for topic in space["mastered_topics"][grade]:
+                if topic not in topics:
+                    topics.append(topic)
+        return cls(prefix, topics), {topic: code for code, topic in enumerate(topics)}
+
+    def __len__(self) -> int:
+        return len(self.grades)
+
+    def profile_id(self, index: int) -> str:
+        return f"{self.prefix}_{index:06d}"
+
+    def index_of(self, profile_id: str) -> Optional[int]:
+        prefix, _, number = profile_id.rpartition("_")
+        if prefix != self.prefix or not number.isdigit():
+            return None
+        index = int(number)
+        return index if index < len(self) else None
+
+    def config(self, index: int) -> Dict:
+        return {
+            "grade": self.grades[index],
+            "likes_math": bool(self.likes_math[index]),
+            "confidence_level": CONFIDENCE_LEVELS[self.confidence[index]],
+            "mastered_topics": self.topics[self.topic_codes[index]],
+            "timss_score": self.timss_scores[index],
+        }
+
+    def user_prompt(self, index: int) -> str:
+        return render_user_prompt(self.config(index))
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        for index in range(len(self)):
+            yield self.profile_id(index), self.config(index)
+
+
+_cohorts: Dict[str, ProfileCohort] = {}
+
+
+def register_cohort(cohort: ProfileCohort) -> ProfileCohort:
+    # Make a cohort's profile ids resolvable by get_profile_config
+    if cohort.prefix == "profile":
+        raise ValueError("Cohort prefix 'profile' is reserved for LEARNER_PROFILE_CONFIGS")
+    _cohorts[cohort.prefix] = cohort
+    return cohort
+
+
+def get_profile_config(profile_id: str) -> Optional[Dict]:
+    if profile_id in LEARNER_PROFILE_CONFIGS:
+        return LEARNER_PROFILE_CONFIGS[profile_id]
+    prefix = profile_id.rpartition("_")[0]
+    cohort = _cohorts.get(prefix)
+    if cohort is not None:
+        index = cohort.index_of(profile_id)
+        if index is not None:
+            return cohort.config(index)
+    return None
+
+
+def iter_profiles(cohort: Optional[ProfileCohort] = None) -> Iterator[Tuple[str, Dict]]:
+    # Hand-written profiles, or a cohort streamed one profile at a time
+    if cohort is None:
+        yield from LEARNER_PROFILE_CONFIGS.items()
+    else:
+        yield from cohort
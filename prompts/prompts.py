@@ -1,3 +1,8 @@
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+from prompts.profiles import LEARNER_PROFILE_CONFIGS, get_profile_config, render_user_prompt
+
 BASE_DIRECTIVE = (
     "You are a mathematics instructor capable of teaching both Grade 4 and Grade 8 students. "
     "Automatically adjust your mathematical language, explanations, and examples to match the "
@@ -65,81 +70,12 @@ TIMSS_NOTE = (
     "intermediate 400-475 (~56%), low below 400 (~87% reach at least low)."
 )
 
-# Learner profile configurations
-LEARNER_PROFILE_CONFIGS = {
-    "profile_1": {
-        "grade": 4,
-        "likes_math": True,
-        "confidence_level": "very confident",
-        "mastered_topics": "all mathematics topics in grade 4, including number, measurement and geometry, and data",
-        "timss_score": 615
-    },
-    "profile_2": {
-        "grade": 4,
-        "likes_math": False,
-        "confidence_level": "not confident",
-        "mastered_topics": "mathematics topics such as number and data in grade 4",
-        "timss_score": 390
-    },
-    "profile_3": {
-        "grade": 4,
-        "likes_math": True,
-        "confidence_level": "confident",
-        "mastered_topics": "all mathematics topics in grade 4, including number, measurement and geometry, and data",
-        "timss_score": 550
-    },
-    "profile_4": {
-        "grade": 8,
-        "likes_math": True,
-        "confidence_level": "very confident",
-        "mastered_topics": "all mathematics topics in grade 8, including number, algebra, geometry and measurement, and data and probability",
-        "timss_score": 625
-    },
-    "profile_5": {
-        "grade": 8,
-        "likes_math": False,
-        "confidence_level": "not confident",
-        "mastered_topics": "mathematics topics such as number and geometry in grade 4",
-        "timss_score": 390
-    },
-    "profile_6": {
-        "grade": 8,
-        "likes_math": True,
-        "confidence_level": "very confident",
-        "mastered_topics": "all mathematics topics in grade 8, including number, algebra, geometry and measurement, and data and probability",
-        "timss_score": 550
-    }
-}
-
-
 def get_user_prompt(profile_id: str) -> str:
-    # Build user prompt based on learner profile
-    if profile_id not in LEARNER_PROFILE_CONFIGS:
+    # Build user prompt based on learner profile (hand-written or from a registered cohort)
+    config = get_profile_config(profile_id)
+    if config is None:
         raise ValueError(f"Unknown profile_id: {profile_id}. Must be one of {list(LEARNER_PROFILE_CONFIGS.keys())}")
-    
-    config = LEARNER_PROFILE_CONFIGS[profile_id]
-    
-    # Start with grade and math attitude
-    introduction = f"I am a student from Grade {config['grade']}, "
-    
-    if config['likes_math']:
-        introduction += "I like learning mathematics very much and "
-    else:
-        introduction += "I don't like learning mathematics and "
-    
-    # Add confidence level
-    if config['confidence_level'] == "very confident":
-        introduction += "I am very confident in mathematics. "
-    elif config['confidence_level'] == "confident":
-        introduction += "I am confident in mathematics. "
-    else:
-        introduction += "I am not confident in mathematics. "
-    
-    # Add mastered topics and TIMSS score
-    introduction += f"Now I have mastered {config['mastered_topics']}. "
-    introduction += f"I got {config['timss_score']} in the TIMSS 2019 Math Test. "
-    
-    return f"{introduction}Can you teach me this math question?"
+    return render_user_prompt(config)
 
 
 def get_system_prompt_group3(grade: int) -> str:
@@ -160,12 +96,13 @@ def get_system_prompt_group4(grade: int) -> str:
     return BASE_DIRECTIVE
 
 
-def get_prompts_by_group(group: int, profile_id: str) -> tuple[str, str]:
-    # Get system and user prompts based on group number
-    if profile_id not in LEARNER_PROFILE_CONFIGS:
+def _render_prompts_by_group(group: int, profile_id: str) -> tuple[str, str]:
+    # Build system and user prompts based on group number
+    config = get_profile_config(profile_id)
+    if config is None:
         raise ValueError(f"Unknown profile_id: {profile_id}")
     
-    grade = LEARNER_PROFILE_CONFIGS[profile_id]["grade"]
+    grade = config["grade"]
     user_prompt = get_user_prompt(profile_id)
     
     if group == 1:
@@ -186,6 +123,31 @@ def get_prompts_by_group(group: int, profile_id: str) -> tuple[str, str]:
         raise ValueError(f"Invalid group number: {group}. Must be 1, 2, 3, or 4.")
 
 
+AVAILABLE_GROUPS = (1, 2, 3, 4)
+
+
+def _build_prompt_table() -> Mapping[Tuple[str, int], Tuple[str, str]]:
+    # Render every (profile, group) pair once; the table is read-only afterwards
+    table = {
+        (profile_id, group): _render_prompts_by_group(group, profile_id)
+        for profile_id in LEARNER_PROFILE_CONFIGS
+        for group in AVAILABLE_GROUPS
+    }
+    return MappingProxyType(table)
+
+
+PROMPT_TABLE = _build_prompt_table()
+
+
+def get_prompts_by_group(group: int, profile_id: str) -> tuple[str, str]:
+    # Get system and user prompts based on group number (precomputed at import)
+    prompts = PROMPT_TABLE.get((profile_id, group))
+    if prompts is not None:
+        return prompts
+    # Not in the table: render directly so unknown inputs raise the usual errors
+    return _render_prompts_by_group(group, profile_id)
+
+
 # Backward compatibility function
 def get_system_prompt_by_grade(grade: int) -> str:
     return get_system_prompt_group4(grade)